@@ -1,14 +1,28 @@
 """Cluster manager for handling multiple OSCAR cluster connections."""
 
+import itertools
 import logging
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass
+from typing import Any, Optional
+from dataclasses import dataclass, field
 from threading import Lock
+from urllib.parse import urlparse
+
+try:
+    from constants import (DEFAULT_LAZY_IMAGE_INDEX, LAZY_IMAGE_NONE, SCHEDULING_LEAST_LOADED, SCHEDULING_POLICIES,
+                           SCHEDULING_ROUND_ROBIN)
+    from service_manager import OSCARServiceManager
+    from utils import create_oscar_client
+except ImportError:
+    # Fallback for package import
+    from .constants import (DEFAULT_LAZY_IMAGE_INDEX, LAZY_IMAGE_NONE, SCHEDULING_LEAST_LOADED, SCHEDULING_POLICIES,
+                            SCHEDULING_ROUND_ROBIN)
+    from .service_manager import OSCARServiceManager
+    from .utils import create_oscar_client
 
 log = logging.getLogger("oscar-backend")
 
 
-@dataclass
+@dataclass(slots=True)
 class ClusterConfig:
     """Configuration for a single OSCAR cluster."""
     endpoint: str
@@ -17,10 +31,28 @@ class ClusterConfig:
     password: Optional[str] = None
     ssl: bool = True
     name: Optional[str] = None
-    steps: Optional[List[str]] = None
+    steps: Optional[list[str]] = None
+    weight: int = 1
+    auth_type: str = field(init=False, default='token')
+    in_flight: int = field(init=False, default=0, compare=False)  # Tasks currently running here
     
     def __post_init__(self):
         """Validate cluster configuration."""
+        self.validate()
+        self.auth_type = 'token' if self.token else 'username/password'
+        
+        # Generate a name if not provided
+        if not self.name:
+            # Scheme-less endpoints have no netloc, so fall back to the leading host part
+            host = urlparse(self.endpoint).netloc or self.endpoint.partition('/')[0]
+            self.name = f"cluster-{host}"
+            
+        # Initialize steps as empty list if None
+        if self.steps is None:
+            self.steps = []
+            
+    def validate(self) -> None:
+        """Check the configuration in place, raising ValueError if it is invalid."""
         if not self.endpoint:
             raise ValueError("Cluster endpoint is required")
         
@@ -30,32 +62,42 @@ class ClusterConfig:
         if self.username and not self.password:
             raise ValueError("Password is required when username is provided")
         
-        # Generate a name if not provided
-        if not self.name:
-            self.name = f"cluster-{self.endpoint.split('://')[-1].split('/')[0]}"
-            
-        # Initialize steps as empty list if None
-        if self.steps is None:
-            self.steps = []
+        if self.weight < 1:
+            raise ValueError("Cluster weight must be a positive integer")
 
 
 class ClusterManager:
-    """Manages multiple OSCAR cluster connections with round-robin scheduling."""
+    """Manages multiple OSCAR cluster connections with weighted round-robin or least-loaded scheduling."""
     
-    def __init__(self):
-        self.clusters: List[ClusterConfig] = []
-        self.current_cluster_index = 0
+    __slots__ = ('clusters', 'scheduling_policy', '_counter', '_schedule', '_lock',
+                 '_cluster_clients', '_service_managers', '_by_name', '_info_cache')
+    
+    def __init__(self, scheduling_policy: str = SCHEDULING_ROUND_ROBIN):
+        if scheduling_policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {scheduling_policy}")
+        self.scheduling_policy = scheduling_policy
+        self.clusters: list[ClusterConfig] = []
+        # itertools.count advances atomically under the GIL, so dispatch needs no lock
+        self._counter = itertools.count()
+        self._schedule: list[ClusterConfig] = []  # Weighted round-robin sequence of clusters
         self._lock = Lock()
         self._cluster_clients = {}  # Cache for OSCAR clients
+        self._service_managers = {}  # Service managers by cluster and mount path
+        self._by_name: dict[str, ClusterConfig] = {}  # Name index for O(1) lookups
+        self._info_cache: Optional[list[dict[str, Any]]] = None  # Built by get_cluster_info
         
     def add_cluster(self, config: ClusterConfig) -> None:
         """Add a cluster configuration."""
         log.info("Adding cluster: %s", config.name)
         self.clusters.append(config)
+        self._by_name.setdefault(config.name, config)
+        self._schedule = self._build_schedule()
+        self._info_cache = None
         
     def add_cluster_from_args(self, endpoint: str, token: Optional[str] = None,
                              username: Optional[str] = None, password: Optional[str] = None,
-                             ssl: bool = True, steps: Optional[List[str]] = None) -> None:
+                             ssl: bool = True, steps: Optional[list[str]] = None,
+                             weight: int = 1) -> None:
         """Add a cluster from individual arguments."""
         config = ClusterConfig(
             endpoint=endpoint,
@@ -63,30 +105,109 @@ class ClusterManager:
             username=username,
             password=password,
             ssl=ssl,
-            steps=steps
+            steps=steps,
+            weight=weight
         )
         self.add_cluster(config)
         
+    def _build_schedule(self) -> list[ClusterConfig]:
+        """Build the interleaved weighted round-robin sequence of clusters.
+        
+        Each round visits every cluster whose weight is still above the round
+        number, so weights 3/2/1 produce A B C A B A rather than A A A B B C.
+        """
+        if len(self.clusters) == 1:
+            # Weight is irrelevant with a single cluster; one slot keeps the fast path
+            return list(self.clusters)
+        schedule = []
+        max_weight = max((cluster.weight for cluster in self.clusters), default=0)
+        for round_number in range(max_weight):
+            for cluster in self.clusters:
+                if cluster.weight > round_number:
+                    schedule.append(cluster)
+        return schedule
+        
     def get_next_cluster(self) -> Optional[ClusterConfig]:
-        """Get the next cluster using round-robin scheduling."""
-        if not self.clusters:
+        """Get the next cluster using weighted round-robin scheduling."""
+        schedule = self._schedule
+        size = len(schedule)
+        if size == 1:
+            # Single-cluster deployments need no counter or modulo
+            return schedule[0]
+        if not size:
             return None
             
-        with self._lock:
-            cluster = self.clusters[self.current_cluster_index]
-            self.current_cluster_index = (self.current_cluster_index + 1) % len(self.clusters)
-            log.debug("Selected cluster: %s (index: %d)", cluster.name, self.current_cluster_index)
-            return cluster
+        # Only the schedule is read, so a concurrent clear_clusters cannot
+        # leave it pointing past the end of self.clusters
+        position = next(self._counter) % size
+        cluster = schedule[position]
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Selected cluster: %s (schedule position: %d)", cluster.name, position)
+        return cluster
+        
+    def get_least_loaded_cluster(self) -> Optional[ClusterConfig]:
+        """Get the cluster with the fewest in-flight tasks relative to its weight."""
+        clusters = self.clusters
+        if not clusters:
+            return None
+        return min(clusters, key=lambda cluster: cluster.in_flight / cluster.weight)
             
+    def get_client(self, config: ClusterConfig):
+        """Get the cached OSCAR client for a cluster, creating it on first use."""
+        key = id(config)
+        client = self._cluster_clients.get(key)
+        if client is None:
+            with self._lock:
+                # Re-check under the lock so concurrent tasks build only one client
+                client = self._cluster_clients.get(key)
+                if client is None:
+                    log.debug("Creating OSCAR client for cluster: %s", config.name)
+                    client = create_oscar_client(
+                        config.endpoint,
+                        config.token,
+                        config.username,
+                        config.password,
+                        config.ssl
+                    )
+                    self._cluster_clients[key] = client
+        return client
+        
+    def get_service_manager(self, config: ClusterConfig, mount_path: str, shared_minio_config=None,
+                            lazy_image_policy: str = LAZY_IMAGE_NONE,
+                            lazy_image_index: str = DEFAULT_LAZY_IMAGE_INDEX) -> OSCARServiceManager:
+        """Get the service manager shared by all tasks on a cluster, creating it on first use.
+        
+        Its caches of created and listed services then last for the whole run
+        instead of a single task.
+        """
+        key = (id(config), mount_path)
+        service_manager = self._service_managers.get(key)
+        if service_manager is None:
+            client = self.get_client(config)
+            with self._lock:
+                service_manager = self._service_managers.get(key)
+                if service_manager is None:
+                    service_manager = OSCARServiceManager(
+                        config.endpoint,
+                        config.token,
+                        config.username,
+                        config.password,
+                        mount_path,
+                        config.ssl,
+                        shared_minio_config,
+                        client=client,
+                        lazy_image_policy=lazy_image_policy,
+                        lazy_image_index=lazy_image_index
+                    )
+                    self._service_managers[key] = service_manager
+        return service_manager
+        
     def get_cluster_by_name(self, name: str) -> Optional[ClusterConfig]:
         """Get a specific cluster by name."""
-        for cluster in self.clusters:
-            if cluster.name == name:
-                return cluster
-        return None
+        return self._by_name.get(name)
         
     def get_cluster_for_step(self, step_name: str) -> Optional[ClusterConfig]:
-        """Get the cluster assigned to a specific workflow step, or use round-robin if not mapped."""
+        """Get the cluster assigned to a specific workflow step, or use the scheduling policy if not mapped."""
         if not self.clusters:
             return None
             
@@ -96,10 +217,38 @@ class ClusterManager:
                 log.info("Step '%s' mapped to cluster '%s'", step_name, cluster.name)
                 return cluster
         
-        # If no explicit mapping found, use round-robin scheduling
-        log.debug("Step '%s' not explicitly mapped, using round-robin selection", step_name)
+        # If no explicit mapping found, fall back to the scheduling policy
+        log.debug("Step '%s' not explicitly mapped, using %s selection", step_name, self.scheduling_policy)
+        if self.scheduling_policy == SCHEDULING_LEAST_LOADED:
+            return self.get_least_loaded_cluster()
         return self.get_next_cluster()
         
+    def candidate_clusters_for_step(self, step_name: str) -> list[ClusterConfig]:
+        """Clusters a step may be scheduled on: its mapped cluster, or every scheduled cluster."""
+        for cluster in self.clusters:
+            if cluster.steps and step_name in cluster.steps:
+                return [cluster]
+        scheduled = {id(cluster) for cluster in self._schedule}
+        return [cluster for cluster in self.clusters if id(cluster) in scheduled]
+        
+    def acquire_cluster_for_step(self, step_name: str) -> Optional[ClusterConfig]:
+        """Select a cluster for a step and count the task as in flight on it.
+        
+        Selection and the counter update happen under the lock so that tasks
+        started together do not all see the same cluster as least loaded.
+        Every acquired cluster must be handed back with release_cluster.
+        """
+        with self._lock:
+            cluster = self.get_cluster_for_step(step_name)
+            if cluster is not None:
+                cluster.in_flight += 1
+        return cluster
+        
+    def release_cluster(self, cluster: ClusterConfig) -> None:
+        """Mark a task previously acquired on a cluster as finished."""
+        with self._lock:
+            cluster.in_flight = max(cluster.in_flight - 1, 0)
+        
     def get_cluster_count(self) -> int:
         """Get the total number of clusters."""
         return len(self.clusters)
@@ -112,15 +261,8 @@ class ClusterManager:
             
         for cluster in self.clusters:
             try:
-                # This will raise ValueError if config is invalid
-                _ = ClusterConfig(
-                    endpoint=cluster.endpoint,
-                    token=cluster.token,
-                    username=cluster.username,
-                    password=cluster.password,
-                    ssl=cluster.ssl,
-                    name=cluster.name
-                )
+                # Re-check the existing instance; configs may be mutated after creation
+                cluster.validate()
             except ValueError as e:
                 log.error("Invalid cluster configuration for %s: %s", cluster.name, e)
                 return False
@@ -128,27 +270,40 @@ class ClusterManager:
         log.info("Validated %d cluster configurations", len(self.clusters))
         return True
         
-    def get_cluster_info(self) -> List[Dict[str, Any]]:
-        """Get information about all clusters."""
+    def get_cluster_info(self) -> list[dict[str, Any]]:
+        """Get information about all clusters.
+        
+        The list is cached until the cluster set changes; treat it as read-only.
+        """
+        if self._info_cache is not None:
+            return self._info_cache
         info = []
         for i, cluster in enumerate(self.clusters):
             cluster_info = {
                 'index': i,
                 'name': cluster.name,
                 'endpoint': cluster.endpoint,
-                'auth_type': 'token' if cluster.token else 'username/password',
+                'auth_type': cluster.auth_type,
                 'ssl': cluster.ssl,
+                'weight': cluster.weight,
                 'steps': cluster.steps if cluster.steps else []
             }
             info.append(cluster_info)
+        self._info_cache = info
         return info
         
     def clear_clusters(self) -> None:
         """Clear all cluster configurations."""
-        with self._lock:
-            self.clusters.clear()
-            self.current_cluster_index = 0
-            self._cluster_clients.clear()
+        # Swap in fresh containers instead of clearing in place; attribute
+        # assignment is atomic, so concurrent readers see either the old or
+        # the new containers and never a partially cleared one
+        self._schedule = []
+        self.clusters = []
+        self._by_name = {}
+        self._cluster_clients = {}
+        self._service_managers = {}
+        self._info_cache = None
+        self._counter = itertools.count()
             
     def __len__(self) -> int:
         """Return the number of clusters."""
@@ -10,27 +10,80 @@ DEFAULT_DOCKER_IMAGE = 'opensourcefoundries/minideb:jessie'
 DEFAULT_MOUNT_PATH = '/mnt/cwl-oscar/mount'
 DEFAULT_CLUSTER_ID = 'oscar-cluster'
 
+# Cluster scheduling policies for steps without an explicit cluster mapping
+SCHEDULING_ROUND_ROBIN = 'round-robin'
+SCHEDULING_LEAST_LOADED = 'least-loaded'
+SCHEDULING_POLICIES = (SCHEDULING_ROUND_ROBIN, SCHEDULING_LEAST_LOADED)
+
+# Local job executor limits; each slot is an in-flight remote OSCAR job, not a host CPU
+DEFAULT_MAX_PARALLEL_TASKS = 64
+# cwltool starts one worker thread per slot up front; far beyond this, thread creation fails
+MAX_PARALLEL_TASKS_LIMIT = 1000
+# Remote resource pool that ResourceRequirement cores/RAM are accounted against
+DEFAULT_CLUSTER_CORES = 1024
+DEFAULT_CLUSTER_RAM = 8 * 1024  # GiB
+LOCAL_JOB_WORKERS = 4  # threads evaluating ExpressionTool and callback jobs next to the OSCAR tasks
+
 # Retry configuration
 DEFAULT_MAX_RETRIES = 3
 DEFAULT_RETRY_DELAY = 2  # seconds
 DEFAULT_RETRY_MULTIPLIER = 2  # exponential backoff
+DEFAULT_RETRY_MAX_DELAY = 30  # seconds
 
 # Timeout configuration
 DEFAULT_UPLOAD_TIMEOUT = 300  # seconds
-DEFAULT_CHECK_INTERVAL = 5  # seconds
-DEFAULT_SERVICE_SETUP_WAIT = 3  # seconds
+# Completion polling: exponential backoff (with jitter) between checks
+DEFAULT_POLL_INITIAL_DELAY = 0.25  # seconds
+DEFAULT_POLL_MAX_DELAY = 10  # seconds
+DEFAULT_POLL_BACKOFF_FACTOR = 1.5
+DEFAULT_SERVICE_SETUP_WAIT = 3  # seconds, at most, for a created service to show up
+SERVICE_READY_POLL_INITIAL_DELAY = 0.1  # seconds
+SERVICE_READY_POLL_MAX_DELAY = 1  # seconds
+
+# Downloads from S3-compatible storage: objects above the chunk size use parallel ranged GETs
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # bytes
+DEFAULT_DOWNLOAD_CONCURRENCY = 4  # overridden by CWL_OSCAR_DOWNLOAD_CONCURRENCY
+
+# Job batching: jobs for the same service submitted within the window share one OSCAR invocation
+DEFAULT_BATCH_MAX_JOBS = 1  # default of --oscar-batch-size; 1 disables batching
+DEFAULT_BATCH_WINDOW = 0.05  # seconds; default of --oscar-batch-window
+BATCH_CODES_EXTENSION = '.codes'
+
+# boto3 clients of S3-compatible storage providers, shared by all concurrent jobs
+STORAGE_MAX_POOL_CONNECTIONS = 64  # one connection per job in flight, up to DEFAULT_MAX_PARALLEL_TASKS
+STORAGE_MAX_ATTEMPTS = 5  # adaptive retries of throttled or failed storage requests
 
 # Service naming
 SERVICE_NAME_PREFIX = 'clt-'
 SERVICE_HASH_LENGTH = 8
+SERVICE_INDEX_TTL = 30  # seconds a listing of the cluster's services is reused
+SERVICE_CACHE_FILE = '~/.cache/cwl-oscar/services.json'
+SERVICE_CACHE_TTL = 3600  # seconds a service verified by an earlier run is trusted without checking
+
+# Image warm-up: no-op invocations of a newly created service so its image is pulled early
+ENABLE_SERVICE_WARMUP = False  # overridden by CWL_OSCAR_WARMUP=1
+SERVICE_WARMUP_INVOCATIONS = 1
+SERVICE_WARMUP_TIMEOUT = 600  # seconds to wait for warm-up invocations before cleaning up after them
+SERVICE_LOG_EXTENSIONS = ('.out.log', '.err.log')  # written next to the exit code by the service script
+SERVICE_PREWARM_WORKERS = 8  # services created concurrently (default size of the shared creation pool)
+
+# Lazy-pull image variants (SOCI / eStargz) looked up in a user mapping file
+LAZY_IMAGE_NONE = 'none'
+LAZY_IMAGE_AUTO = 'auto'
+LAZY_IMAGE_FORMATS = ('soci', 'estargz')  # in the order 'auto' prefers them
+LAZY_IMAGE_POLICIES = (LAZY_IMAGE_NONE, *LAZY_IMAGE_FORMATS, LAZY_IMAGE_AUTO)
+LAZY_IMAGE_SNAPSHOTTERS = {'soci': 'soci', 'estargz': 'stargz'}
+DEFAULT_LAZY_IMAGE_INDEX = '~/.cwl-oscar/soci-index.yaml'
 
 # Storage providers
 DEFAULT_STORAGE_PROVIDER = 'minio.default'
+DEFAULT_MINIO_ENDPOINT = 'http://minio-service.minio:9000'  # in-cluster MinIO, used when the cluster reports none
 SHARED_STORAGE_PROVIDER = 'minio.shared'
 DEFAULT_REGION = 'us-east-1'
 
 # File extensions
 EXIT_CODE_EXTENSION = '.exit_code'
+EXIT_CODE_MAX_BYTES = 16  # read limit for exit code files ("0\n" in practice)
 OUTPUT_EXTENSION = '.output'
 
 # Logging prefixes
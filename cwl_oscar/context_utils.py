@@ -2,6 +2,11 @@
 
 import contextlib
 import sys
+import threading
+
+_redirect_lock = threading.Lock()
+_redirect_depth = 0
+_original_stdout = None
 
 
 @contextlib.contextmanager
@@ -9,10 +14,21 @@ def suppress_stdout_to_stderr():
     """Context manager to redirect stdout to stderr during oscar-python operations.
     
     This prevents oscar-python library messages from contaminating the JSON output.
+    Concurrent and nested uses share one redirect: the first to enter swaps
+    sys.stdout and the last to leave restores it, so threads cannot restore
+    each other's swap.
     """
-    original_stdout = sys.stdout
+    global _redirect_depth, _original_stdout
+    with _redirect_lock:
+        if _redirect_depth == 0:
+            _original_stdout = sys.stdout
+            sys.stdout = sys.stderr
+        _redirect_depth += 1
     try:
-        sys.stdout = sys.stderr
         yield
     finally:
-        sys.stdout = original_stdout
+        with _redirect_lock:
+            _redirect_depth -= 1
+            if _redirect_depth == 0:
+                sys.stdout = _original_stdout
+                _original_stdout = None
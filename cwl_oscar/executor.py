@@ -1,32 +1,248 @@
 """OSCAR Executor for command execution."""
 
-import json
+import atexit
+import errno
 import logging
 import os
+import random
+import re
 import shlex
 import shutil
 import tempfile
+import threading
 import time
 import uuid
+from concurrent.futures import Future
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 
+import requests
+from boto3.s3.transfer import TransferConfig
+
 try:
     from constants import *
-    from utils import create_oscar_client
-    from context_utils import suppress_stdout_to_stderr
+    from utils import create_oscar_client, get_provider_client, forget_storage_clients, json_loads, JobLogAdapter
 except ImportError:
     # Fallback for package import
     from .constants import *
-    from .utils import create_oscar_client
-    from .context_utils import suppress_stdout_to_stderr
+    from .utils import create_oscar_client, get_provider_client, forget_storage_clients, json_loads, JobLogAdapter
 
 log = logging.getLogger("oscar-backend")
 
+# Fixed parts of the per-job command script, see OSCARExecutor.build_command_script
+_SCRIPT_HEADER = (
+    "#!/bin/bash\n\n"
+    "# CWL Command Script Generated by cwl-oscar\n\n"
+    "# Set environment variables\n"
+)
+# Use TMP_OUTPUT_DIR as workspace (available by default in OSCAR execution)
+_SCRIPT_WORKSPACE = (
+    "\n# Use TMP_OUTPUT_DIR as workspace\n"
+    "cd \"$TMP_OUTPUT_DIR\"\n"
+    "echo \"Working in: $TMP_OUTPUT_DIR\"\n\n"
+)
+# Run the command (cwltool handles input/output file management), then copy
+# all output from TMP_OUTPUT_DIR to the mount path and keep the exit code.
+# The command line goes between the two parts.
+_SCRIPT_COMMAND = "# Execute CWL command\n"
+_SCRIPT_FOOTER = (
+    "\nexit_code=$?\n\n"
+    "# Copy output files to mount path\n"
+    "OUTPUT_DIR=\"$CWL_MOUNT_PATH/$CWL_JOB_ID\"\n"
+    "mkdir -p \"$OUTPUT_DIR\"\n"
+    "cp -r \"$TMP_OUTPUT_DIR\"/* \"$OUTPUT_DIR\"/ 2>/dev/null || true\n"
+    "echo \"SCRIPT: Files copied to $OUTPUT_DIR\"\n"
+    "echo \"SCRIPT: Command completed with exit code: $exit_code\"\n"
+    "exit $exit_code\n"
+)
+
+# Escapes for values inside a double-quoted bash string, applied in one pass
+_ENV_VALUE_ESCAPES = str.maketrans({'"': '\\"', '$': '\\$', '`': '\\`', '\\': '\\\\'})
+
+# Arguments made only of these characters are left unchanged by shlex.quote
+_SAFE_TOKEN = re.compile(r'[A-Za-z0-9_./=:@%+,-]+')
+
+
+def _escape_env_value(value):
+    """Escape a value for use inside a double-quoted bash string."""
+    return str(value).translate(_ENV_VALUE_ESCAPES)
+
+
+def _quote_arg(arg):
+    """shlex.quote, returning plain tokens (most arguments) as they are."""
+    return arg if _SAFE_TOKEN.fullmatch(arg) else shlex.quote(arg)
+
+
+def _write_script(script_path, content):
+    """Write script bytes to a file created executable; fchmod so the umask can't narrow the mode."""
+    fd = os.open(script_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+    try:
+        os.write(fd, content)
+        os.fchmod(fd, 0o755)
+    finally:
+        os.close(fd)
+
+
+def _find_downloaded_file(temp_dir, filename):
+    """Locate a provider download in temp_dir, preferring a recreated out/ folder, with one directory read per level."""
+    found = None
+    with os.scandir(temp_dir) as entries:
+        for entry in entries:
+            if entry.name == 'out' and entry.is_dir():
+                # Remote structure recreated
+                with os.scandir(entry.path) as out_entries:
+                    for out_entry in out_entries:
+                        if out_entry.name == filename:
+                            return out_entry.path
+            elif entry.name == filename:
+                found = entry.path
+    return found
+
+
+def _full_remote_path(service_out_path, remote_output_path):
+    """Storage path (bucket/key) of an output: the service's output path plus the file, without an 'out/' prefix."""
+    rest = remote_output_path.removeprefix('out/') if service_out_path else remote_output_path
+    return f"{service_out_path}/{rest}"
+
+
+def _is_not_found(error):
+    """Whether a storage (botocore) error means the object does not exist."""
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return False
+    return response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+
+def _retry_after(error):
+    """Seconds a storage (botocore) error's Retry-After header asks to wait, 0 if none."""
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        return 0
+    headers = response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+    try:
+        return float(headers.get('retry-after', 0))
+    except (TypeError, ValueError):
+        # An HTTP date instead of seconds; fall back to the regular backoff
+        return 0
+
+
+# Objects above the chunk size are downloaded as byte ranges on this many threads
+DOWNLOAD_CONCURRENCY = int(os.environ.get('CWL_OSCAR_DOWNLOAD_CONCURRENCY', DEFAULT_DOWNLOAD_CONCURRENCY))
+DOWNLOAD_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    multipart_chunksize=DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    max_concurrency=DOWNLOAD_CONCURRENCY,
+)
+
+# Service configurations by (OSCAR client id, service name), shared by the per-task executors
+_SERVICE_CONFIGS = {}
+
+
+def forget_service_config(client, service_name):
+    """Drop the cached configuration of a service, e.g. once it was deleted or its credentials were rejected."""
+    _SERVICE_CONFIGS.pop((id(client), service_name), None)
+
+
+class ServiceNotFoundError(Exception):
+    """The OSCAR service a job was meant to run on does not exist on the cluster."""
+
+_SPOOL_DIR = None
+_SPOOL_LOCK = threading.Lock()
+
+
+def _spool_dir():
+    """Return the directory holding all job scripts of this process, created on first use."""
+    global _SPOOL_DIR
+    with _SPOOL_LOCK:
+        if _SPOOL_DIR is None:
+            _SPOOL_DIR = tempfile.mkdtemp(prefix="cwl_oscar_")
+            atexit.register(shutil.rmtree, _SPOOL_DIR, ignore_errors=True)
+        return _SPOOL_DIR
+
+
+class _PendingBatch:
+    """Jobs waiting to be submitted together; the job that opened the batch submits it."""
+    
+    def __init__(self):
+        self.jobs = []
+        self.full = threading.Event()
+
+
+class JobBatcher:
+    """
+    Groups the jobs of one run that target the same OSCAR service into batches.
+    
+    One batcher is created per run (from --oscar-batch-size / --oscar-batch-window)
+    and shared by the executors of its tasks. The jobs of a batch run one after
+    another, so a batch takes as long as all of them together.
+    """
+    
+    def __init__(self, max_jobs=DEFAULT_BATCH_MAX_JOBS, window=DEFAULT_BATCH_WINDOW):
+        self.max_jobs = max_jobs  # Jobs per OSCAR invocation; 1 disables batching
+        self.window = window  # Seconds a batch collects jobs before it is submitted
+        self._pending = {}  # Batches still collecting jobs, by (OSCAR client id, service name)
+        self._lock = threading.Lock()
+        
+    @property
+    def enabled(self):
+        return self.max_jobs > 1
+        
+    def add(self, key, job_id, script_content):
+        """
+        Queue a job for the batch of key.
+        
+        Returns:
+            (future of the job's exit code, the batch if this job opened it and must submit it, else None)
+        """
+        result = Future()
+        with self._lock:
+            batch = self._pending.get(key)
+            opened = batch is None
+            if opened:
+                batch = self._pending[key] = _PendingBatch()
+            batch.jobs.append((job_id, script_content, result))
+            if len(batch.jobs) >= self.max_jobs:
+                del self._pending[key]
+                batch.full.set()
+        return result, batch if opened else None
+        
+    def collect(self, key, batch):
+        """Wait until the batch is full or its window closed, then return its jobs that are still queued."""
+        batch.full.wait(self.window)
+        with self._lock:
+            if self._pending.get(key) is batch:
+                del self._pending[key]
+            return [job for job in batch.jobs if not job[2].done()]
+        
+    def withdraw(self, result):
+        """
+        Remove a job from the batch it is queued in, failing it with exit code 1.
+        
+        Returns:
+            True if the job was still queued, False if its batch was already submitted
+        """
+        with self._lock:
+            for batch in self._pending.values():
+                for job in batch.jobs:
+                    if job[2] is result:
+                        batch.jobs.remove(job)
+                        result.set_result(1)
+                        return True
+        return False
+
+
+# Set when the run is interrupted; submissions stop waiting for their output
+SHUTDOWN_EVENT = threading.Event()
+
+# OSCAR job states that still hold (or are waiting for) cluster resources
+ACTIVE_JOB_STATES = ('Pending', 'Running')
+
 
 class OSCARExecutor:
     """Modular executor interface for OSCAR command execution."""
     
-    def __init__(self, oscar_endpoint, oscar_token, oscar_username, oscar_password, mount_path, service_manager=None, ssl=True):
+    def __init__(self, oscar_endpoint, oscar_token, oscar_username, oscar_password, mount_path, service_manager=None, ssl=True, client=None,
+                 batcher=None):
         self.oscar_endpoint = oscar_endpoint
         self.oscar_token = oscar_token
         self.oscar_username = oscar_username
@@ -34,8 +250,12 @@ class OSCARExecutor:
         self.mount_path = mount_path
         self.service_manager = service_manager
         self.ssl = ssl
-        self.client = None
+        self.client = client
         self.service_config = None
+        self.submitted_service = None
+        self.submitted_at = None
+        self.batcher = batcher  # JobBatcher of the run, None disables batching
+        self._batched_result = None  # Exit code future of a job queued in a batch
         
     def get_client(self):
         """Get or create OSCAR client."""
@@ -50,88 +270,75 @@ class OSCARExecutor:
         return self.client
         
     def get_service_config(self):
-        """Get service configuration from OSCAR."""
-        if self.service_config is None:
+        """
+        Get service configuration from OSCAR.
+        
+        Configurations are shared by all executors using the same OSCAR client, so
+        only the first job of a service fetches it.
+        """
+        if self.service_config is None or self.service_config.get('name') != self.service_name:
             client = self.get_client()
-            services = client.list_services()
-            service_json = json.loads(services.text)
+            cache_key = (id(client), self.service_name)
+            cached = _SERVICE_CONFIGS.get(cache_key)
+            if cached is not None and cached[0] is client:
+                self.service_config = cached[1]
+                return self.service_config
             
-            # Find the target service
-            for svc in service_json:
-                if svc['name'] == self.service_name:
-                    self.service_config = svc
-                    break
-            
-            if not self.service_config:
-                raise Exception(f"Service {self.service_name} not found")
+            # Ask for the single service instead of listing and scanning all of them
+            try:
+                response = client.get_service(self.service_name)
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    raise ServiceNotFoundError(f"Service {self.service_name} not found")
+                raise
+            self.service_config = json_loads(response.content)
+            _SERVICE_CONFIGS[cache_key] = (client, self.service_config)
                 
         return self.service_config
         
-    def create_command_script(self, command, environment, working_directory, stdout_file=None, output_dir=".", job_id=None, tool_spec=None):
-        """Create a simplified script file with just the CWL command."""
+    def build_command_script(self, command, environment, stdout_file=None, job_id=None, tool_spec=None):
+        """Build the script running just the CWL command, returning (script_name, script_content)."""
         random_uuid = str(uuid.uuid4())
         job_id = job_id or random_uuid
         script_name = f"cwl_command_{job_id}.sh"
-        script_path = os.path.join(output_dir, script_name)
-        
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Create simple bash script content
-        script_content = "#!/bin/bash\n\n"
-        script_content += "# CWL Command Script Generated by cwl-oscar\n\n"
-        
-        # Set environment variables including CWL_JOB_ID
-        script_content += "# Set environment variables\n"
-        script_content += f'export CWL_JOB_ID="{job_id}"\n'
-        
-        for key, value in environment.items():
-            # Escape quotes and handle special characters
-            escaped_value = str(value).replace('"', '\\"').replace('$', '\\$')
-            script_content += f'export {key}="{escaped_value}"\n'
-        
-        # Use TMP_OUTPUT_DIR as workspace (available by default in OSCAR execution)
-        script_content += "\n# Use TMP_OUTPUT_DIR as workspace\n"
-        script_content += "cd \"$TMP_OUTPUT_DIR\"\n"
-        script_content += "echo \"Working in: $TMP_OUTPUT_DIR\"\n\n"
-        
-        # * Handle InitialWorkDirRequirement for inline file creation
-        if tool_spec:
-            script_content += self._generate_initial_work_dir_commands(tool_spec)
-        
-        
-        # Execute the main command (cwltool handles input/output file management)
-        script_content += "# Execute CWL command\n"
         
         # Quote command arguments properly
-        quoted_command = [shlex.quote(arg) for arg in command]
-        command_line = ' '.join(quoted_command)
-        
+        command_line = ' '.join(map(_quote_arg, command))
         # Handle stdout redirection if specified
         if stdout_file:
-            script_content += f"{command_line} > {shlex.quote(stdout_file)} 2>&1\n"
-        else:
-            script_content += f"{command_line}\n"
-        
-        # Store the exit code
-        script_content += "exit_code=$?\n\n"
-        
-        # Copy all output from TMP_OUTPUT_DIR to the mount path
-        script_content += "# Copy output files to mount path\n"
-        script_content += "OUTPUT_DIR=\"$CWL_MOUNT_PATH/$CWL_JOB_ID\"\n"
-        script_content += "mkdir -p \"$OUTPUT_DIR\"\n"
-        script_content += "cp -r \"$TMP_OUTPUT_DIR\"/* \"$OUTPUT_DIR\"/ 2>/dev/null || true\n"
-        script_content += "echo \"SCRIPT: Files copied to $OUTPUT_DIR\"\n"
-        script_content += "echo \"SCRIPT: Command completed with exit code: $exit_code\"\n"
-        script_content += "exit $exit_code\n"
-        
-        # Write the script to file
-        with open(script_path, 'w') as f:
-            f.write(script_content)
+            command_line = f"{command_line} > {shlex.quote(stdout_file)} 2>&1"
+        
+        # Set environment variables including CWL_JOB_ID; escape quotes and $ for the double-quoted values
+        exports = [f'export CWL_JOB_ID="{job_id}"\n']
+        exports.extend(
+            f'export {key}="{_escape_env_value(value)}"\n' for key, value in environment.items()
+        )
+        
+        script_content = "".join([
+            _SCRIPT_HEADER,
+            *exports,
+            _SCRIPT_WORKSPACE,
+            # * Handle InitialWorkDirRequirement for inline file creation
+            self._generate_initial_work_dir_commands(tool_spec) if tool_spec else "",
+            _SCRIPT_COMMAND,
+            command_line,
+            _SCRIPT_FOOTER,
+        ])
+        
+        log.debug("[job] Built command script: %s with command: %s", script_name, command_line)
+        return script_name, script_content
+    
+    def create_command_script(self, command, environment, working_directory, stdout_file=None, output_dir=".", job_id=None, tool_spec=None):
+        """Create a simplified script file with just the CWL command."""
+        script_name, script_content = self.build_command_script(
+            command, environment, stdout_file=stdout_file, job_id=job_id, tool_spec=tool_spec
+        )
+        script_path = os.path.join(output_dir, script_name)
         
-        # Make script executable
-        os.chmod(script_path, 0o755)
+        os.makedirs(output_dir, exist_ok=True)
+        _write_script(script_path, script_content.encode('utf-8'))
         
-        log.debug("[job] Created command script: %s with command: %s", script_path, command_line)
+        log.debug("[job] Created command script: %s", script_path)
         return script_path
     
     def _generate_initial_work_dir_commands(self, tool_spec):
@@ -214,12 +421,25 @@ class OSCARExecutor:
                 
         return commands
         
-    def upload_and_wait_for_output(self, local_file_path, timeout_seconds=DEFAULT_UPLOAD_TIMEOUT, check_interval=DEFAULT_CHECK_INTERVAL):
-        """Upload a file to OSCAR service and wait for the corresponding output file."""
+    def upload_and_wait_for_output(self, local_file_path, timeout_seconds=DEFAULT_UPLOAD_TIMEOUT,
+                                   initial_interval=DEFAULT_POLL_INITIAL_DELAY, max_interval=DEFAULT_POLL_MAX_DELAY,
+                                   content=None, output_suffix=EXIT_CODE_EXTENSION):
+        """
+        Upload a file to OSCAR service and wait for the corresponding output file
+        (the file name plus output_suffix, by default the exit code file).
+        
+        Given content (the file's bytes), S3-compatible providers receive it straight
+        from memory and local_file_path is only written for other providers.
+        
+        The exit code object is checked with a HEAD request on its exact key when
+        the storage provider supports it, otherwise by listing that key. Checks back
+        off exponentially (with jitter) from initial_interval up to max_interval,
+        waiting longer when the storage backend answers with a Retry-After header.
+        """
         
         # Get service configuration
         service = self.get_service_config()
-        storage_service = self.get_client().create_storage_client()
+        client = self.get_client()
         
         # Extract service configuration
         in_provider = service['input'][0]['storage_provider']
@@ -228,50 +448,181 @@ class OSCARExecutor:
         out_path = service['output'][0]['path']
         
         file_name = os.path.basename(local_file_path)
-        expected_output_name = file_name + EXIT_CODE_EXTENSION
-        expected_output_path = out_path + "/" + expected_output_name
+        expected_output_path = f"{out_path}/{file_name}{output_suffix}"
+        
+        if SHUTDOWN_EVENT.is_set():
+            log.warning("Shutting down, not submitting %s", file_name)
+            return None
         
         log.info("Uploading %s to OSCAR service...", file_name)
         
-        # Upload the input file
+        # Upload the input file; OSCAR jobs created from now on may belong to this submission
+        submitted_at = time.time()
         try:
-            with suppress_stdout_to_stderr():
-                storage_service.upload_file(in_provider, local_file_path, in_path)
+            uploaded = self._upload(client, in_provider, in_path, local_file_path, content)
         except Exception as e:
+            if isinstance(getattr(e, 'response', None), dict):
+                # Storage errors include rejected credentials; build fresh clients for the next job
+                forget_storage_clients(client)
+                forget_service_config(client, self.service_name)
             log.error("Upload failed: %s", e)
             return None
+        if uploaded is False:
+            # oscar-python reports S3 errors (e.g. rejected credentials) by returning False;
+            # build fresh storage clients for the next job
+            forget_storage_clients(client)
+            forget_service_config(client, self.service_name)
+            log.error("Upload failed: %s was not stored", file_name)
+            return None
+        self.submitted_service = self.service_name
+        self.submitted_at = submitted_at
         
         log.info("Waiting for output file (max %ds)...", timeout_seconds)
         
+        # The provider's boto3 client answers HEAD requests; build it once for the whole wait
+        bucket, key = expected_output_path.split('/', 1)
+        expected_keys = frozenset((key, expected_output_path))
+        s3_client = self._get_s3_client(out_provider)
+        
         # Wait for the output file
         start_time = time.time()
+        delay = initial_interval
+        retry_after = 0
+        last_error = None
         while time.time() - start_time < timeout_seconds:
+            if SHUTDOWN_EVENT.is_set():
+                log.warning("Shutting down, stopped waiting for output of %s", file_name)
+                return None
             try:
-                with suppress_stdout_to_stderr():
-                    files = storage_service.list_files_from_path(out_provider, expected_output_path)
+                if s3_client is not None:
+                    head = s3_client.head_object(Bucket=bucket, Key=key)
+                    log.info("Output file found: %s (%s bytes)", key, head.get('ContentLength'))
+                    self.submitted_at = None
+                    return {'Key': key, 'Size': head.get('ContentLength')}
                 
-                if 'Contents' in files:
-                    for file_entry in files['Contents']:
-                        if file_entry['Key'] == expected_output_path or file_entry['Key'].endswith(expected_output_name):
-                            log.info("Output file found: %s (%s bytes)", file_entry['Key'], file_entry['Size'])
-                            return file_entry
+                files = get_provider_client(client, out_provider, service).list_files_from_path(expected_output_path)
                 
-                time.sleep(check_interval)
+                # oscar-python lists the whole output folder, not just this key
+                for file_entry in files.get('Contents', ()):
+                    if file_entry['Key'] in expected_keys:
+                        log.info("Output file found: %s (%s bytes)", file_entry['Key'], file_entry['Size'])
+                        self.submitted_at = None
+                        return file_entry
+                last_error = None
                 
             except Exception as e:
-                log.debug("Error checking for output: %s", e)
-                time.sleep(check_interval)
-        
-        log.error("Timeout: Output file not found after %d seconds", timeout_seconds)
+                if _is_not_found(e):
+                    last_error = None
+                else:
+                    last_error = e
+                    log.debug("Error checking for output: %s", e)
+                    # A throttled storage backend says how long to stay away
+                    retry_after = _retry_after(e)
+            
+            remaining = timeout_seconds - (time.time() - start_time)
+            pause = max(delay * random.uniform(0.8, 1.2), retry_after)
+            retry_after = 0
+            SHUTDOWN_EVENT.wait(max(0.0, min(pause, remaining)))
+            delay = min(delay * DEFAULT_POLL_BACKOFF_FACTOR, max_interval)
+        
+        if last_error is not None:
+            log.error("Timeout: Output file not found after %d seconds (last error: %s)", timeout_seconds, last_error)
+        else:
+            log.error("Timeout: Output file not found after %d seconds", timeout_seconds)
         return None
         
+    def cancel_submitted_jobs(self):
+        """
+        Best-effort removal of the OSCAR jobs started by the current submission.
+        
+        OSCAR does not report which job an upload triggered, so every pending or
+        running job of the submitted service created since the upload is removed.
+        A job still queued in a batch is taken out of it instead.
+        
+        Returns:
+            Number of jobs removed
+        """
+        batched_result = self._batched_result
+        if batched_result is not None and self.batcher.withdraw(batched_result):
+            log.info("Withdrew a job queued for a batched submission to %s", self.service_name)
+        if self.submitted_at is None:
+            return 0
+        
+        client = self.get_client()
+        removed = 0
+        page = ""
+        while True:
+            response = client.list_jobs(self.submitted_service, page)
+            listing = json_loads(response.content)
+            for job_name, job_info in (listing.get('jobs') or {}).items():
+                if job_info.get('status') not in ACTIVE_JOB_STATES:
+                    continue
+                creation_time = job_info.get('creation_time')
+                if creation_time and datetime.fromisoformat(creation_time).timestamp() < int(self.submitted_at):
+                    continue
+                try:
+                    client.remove_job(self.submitted_service, job_name)
+                    removed += 1
+                    log.info("Removed OSCAR job %s of service %s", job_name, self.submitted_service)
+                except Exception as e:
+                    log.warning("Could not remove OSCAR job %s: %s", job_name, e)
+            page = listing.get('next_page')
+            if not page:
+                break
+        
+        self.submitted_at = None
+        return removed
+        
+    def _upload(self, client, provider, remote_path, local_file_path, content=None):
+        """Upload a file into the remote_path folder, from memory when content is given and the provider allows it."""
+        if content is not None:
+            s3_client = self._get_s3_client(provider)
+            if s3_client is not None:
+                # Same key as oscar-python's upload_file: <bucket>/<folder>/<file name>
+                bucket, folder = remote_path.split('/', 1)
+                s3_client.put_object(Bucket=bucket, Key=f"{folder}/{os.path.basename(local_file_path)}", Body=content)
+                return True
+            _write_script(local_file_path, content)
+        return get_provider_client(client, provider, self.get_service_config()).upload_file(local_file_path, remote_path)
+    
+    def _get_s3_client(self, provider):
+        """Return the boto3 client of an S3-compatible storage provider, or None for other providers."""
+        try:
+            provider_client = get_provider_client(self.get_client(), provider, self.get_service_config())
+            s3_client = getattr(provider_client, 'client', None)
+        except Exception as e:
+            log.debug("No S3 client for storage provider %s: %s", provider, e)
+            return None
+        return s3_client if hasattr(s3_client, 'head_object') else None
+        
+    def download_output_bytes(self, remote_output_path, max_bytes=None):
+        """
+        Read an output object from OSCAR storage into memory, at most max_bytes of it.
+        
+        Returns None when the output provider has no boto3 client or the read
+        fails; download_output_file then remains the way to get the file.
+        """
+        try:
+            service = self.get_service_config()
+            s3_client = self._get_s3_client(service['output'][0]['storage_provider'])
+            if s3_client is None:
+                return None
+            bucket, key = _full_remote_path(service['output'][0]['path'], remote_output_path).split('/', 1)
+            body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+            try:
+                return body.read(max_bytes)
+            finally:
+                body.close()
+        except Exception as e:
+            log.debug("In-memory download of %s failed: %s", remote_output_path, e)
+            return None
+    
     def download_output_file(self, remote_output_path, local_download_path):
         """Download an output file from OSCAR service."""
         
         try:
             # Get service configuration
             service = self.get_service_config()
-            storage_service = self.get_client().create_storage_client()
             out_provider = service['output'][0]['storage_provider']
             service_out_path = service['output'][0]['path']
             
@@ -282,35 +633,32 @@ class OSCARExecutor:
             # Create directories
             os.makedirs(temp_dir, exist_ok=True)
             
-            # Construct full remote path (service_out_path + filename)
-            if service_out_path and remote_output_path.startswith('out/'):
-                file_only = remote_output_path[4:]  # Remove 'out/' prefix
-                full_remote_path = service_out_path + '/' + file_only
-            else:
-                full_remote_path = service_out_path + '/' + remote_output_path
+            full_remote_path = _full_remote_path(service_out_path, remote_output_path)
             
             log.debug("Downloading %s...", filename)
             
-            # Download using correct parameter order: provider, local_directory, remote_path
-            with suppress_stdout_to_stderr():
-                storage_service.download_file(out_provider, temp_dir, full_remote_path)
-            
-            # Find downloaded file
-            possible_paths = [
-                os.path.join(temp_dir, 'out', filename),  # remote structure recreated
-                os.path.join(temp_dir, filename),  # filename in temp directory
-            ]
+            # S3 providers: boto3 fetches large objects as parallel byte ranges
+            s3_client = self._get_s3_client(out_provider)
+            if s3_client is not None:
+                bucket, key = full_remote_path.split('/', 1)
+                s3_client.download_file(bucket, key, local_download_path, Config=DOWNLOAD_TRANSFER_CONFIG)
+                log.debug("Download successful: %s", local_download_path)
+                return True
             
-            downloaded_file_path = None
-            for path in possible_paths:
-                if os.path.exists(path):
-                    downloaded_file_path = path
-                    break
+            # Download using correct parameter order: provider, local_directory, remote_path
+            get_provider_client(self.get_client(), out_provider, service).download_file(temp_dir, full_remote_path)
             
+            downloaded_file_path = _find_downloaded_file(temp_dir, filename)
             if downloaded_file_path:
-                # Move to desired location if needed
+                # Move to desired location if needed; the provider wrote below the target's
+                # directory, so this is a rename rather than a copy
                 if downloaded_file_path != local_download_path:
-                    shutil.move(downloaded_file_path, local_download_path)
+                    try:
+                        os.replace(downloaded_file_path, local_download_path)
+                    except OSError as e:
+                        if e.errno != errno.EXDEV:
+                            raise
+                        shutil.move(downloaded_file_path, local_download_path)
                 
                 log.debug("Download successful: %s", local_download_path)
                 return True
@@ -323,6 +671,128 @@ class OSCARExecutor:
             return False
 
         
+    def _execute_batched(self, job_name, job_id, script_content):
+        """
+        Queue a job for the current service and return its exit code once its batch ran.
+        
+        The first job of a batch waits up to the batcher's window (or until the
+        batch is full) and then submits all of them with batch_execute.
+        """
+        job_log = JobLogAdapter(log, job_name)
+        key = (id(self.get_client()), self.service_name)
+        result, batch = self.batcher.add(key, job_id, script_content)
+        self._batched_result = result
+        try:
+            if batch is not None:
+                jobs = self.batcher.collect(key, batch)
+                if jobs:
+                    try:
+                        exit_codes = self.batch_execute([(job_id, script) for job_id, script, _ in jobs])
+                    except Exception as e:
+                        job_log.error("Error executing batch via OSCAR: %s", e)
+                        exit_codes = [None] * len(jobs)
+                    for (_, _, job_result), exit_code in zip(jobs, exit_codes):
+                        job_result.set_result(1 if exit_code is None else exit_code)
+            else:
+                job_log.debug("Queued for a batched submission to %s", self.service_name)
+            exit_code = result.result()
+        finally:
+            self._batched_result = None
+        
+        if exit_code == 0:
+            job_log.info("OSCAR job completed successfully")
+        else:
+            job_log.warning("OSCAR job completed with exit code %d", exit_code)
+        return exit_code
+    
+    def batch_execute(self, jobs):
+        """
+        Run several command scripts for the current service in one OSCAR invocation.
+        
+        The scripts run one after another, each in a subshell with its own
+        TMP_OUTPUT_DIR, so outputs still end up in mount_path/job_id. The batch
+        takes as long as all its jobs together, so the wait for it is scaled by the
+        number of jobs. The batch script records every exit code in a file that is
+        uploaded to the output storage once all jobs finished.
+        
+        Args:
+            jobs: List of (job_id, script_content) tuples; job ids must be unique
+            
+        Returns:
+            List with the exit code of each job, in order (None if it was not recorded)
+            
+        Raises:
+            ValueError: If two jobs share a job id (they would share their output directory)
+        """
+        job_ids = [job_id for job_id, _ in jobs]
+        if len(set(job_ids)) != len(job_ids):
+            raise ValueError(f"Batched jobs need unique job ids: {job_ids}")
+        
+        batch_name = f"cwl_batch_{uuid.uuid4().hex}.sh"
+        codes_file = f'"$BATCH_OUTPUT_DIR"/{batch_name}{BATCH_CODES_EXTENSION}'
+        parts = [
+            "#!/bin/bash\n\n"
+            "# CWL Batch Script Generated by cwl-oscar\n"
+            "BATCH_OUTPUT_DIR=\"$TMP_OUTPUT_DIR\"\n"
+        ]
+        for index, (job_id, script_content) in enumerate(jobs):
+            job_dir = f'"$BATCH_OUTPUT_DIR"/{shlex.quote(job_id)}'
+            parts.append(
+                f"\nmkdir -p {job_dir}\n"
+                f"(\nexport TMP_OUTPUT_DIR={job_dir}\n{script_content}) < /dev/null\n"
+                f"echo {index} $? >> {codes_file}\n"
+            )
+        log.info("Submitting %d batched jobs to OSCAR service %s", len(jobs), self.service_name)
+        
+        temp_dir = os.path.join(_spool_dir(), uuid.uuid4().hex)
+        os.mkdir(temp_dir)
+        try:
+            # The codes file is written by the batch script itself, so it is complete once it shows up
+            codes_entry = self.upload_and_wait_for_output(
+                os.path.join(temp_dir, batch_name),
+                timeout_seconds=DEFAULT_UPLOAD_TIMEOUT * len(jobs),
+                content="".join(parts).encode('utf-8'),
+                output_suffix=BATCH_CODES_EXTENSION,
+            )
+            exit_codes = [None] * len(jobs)
+            if codes_entry is None:
+                log.error("Failed to get the exit codes of batch %s from OSCAR", batch_name)
+                return exit_codes
+            codes_path = os.path.join(temp_dir, batch_name + BATCH_CODES_EXTENSION)
+            if not self.download_output_file(codes_entry['Key'], codes_path):
+                log.error("Failed to download the exit codes of batch %s", batch_name)
+                return exit_codes
+            with open(codes_path) as codes:
+                for line in codes:
+                    index, _, code = line.partition(' ')
+                    try:
+                        exit_codes[int(index)] = int(code)
+                    except (ValueError, IndexError):
+                        log.warning("Ignoring malformed exit code line of batch %s: %r", batch_name, line)
+            return exit_codes
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def _ensure_service_exists(self, tool_spec, job_name, job_log):
+        """
+        Check that the selected service is still on the cluster before submitting to it.
+        
+        A service remembered from an earlier run may have been deleted since. It is
+        then dropped from the service manager's caches and looked up or created once
+        more; a second miss raises ServiceNotFoundError.
+        """
+        try:
+            self.get_service_config()
+        except ServiceNotFoundError:
+            job_log.warning("%s: Service %s not found, creating it again", LOG_PREFIX_EXECUTOR, self.service_name)
+            forget_service_config(self.get_client(), self.service_name)
+            self.service_manager.forget_service(self.service_name)
+            self.service_name = self.service_manager.get_or_create_service(tool_spec, job_name)
+            # The service may have been created again under the same name; fetch its new configuration
+            forget_service_config(self.get_client(), self.service_name)
+            self.service_config = None
+            self.get_service_config()
+    
     def execute_command(self, command, environment, working_directory, job_name, tool_spec=None, stdout_file=None, job_id=None):
         """
         Execute a command using OSCAR service via file upload/download and return the exit code.
@@ -339,91 +809,114 @@ class OSCARExecutor:
         Returns:
             Exit code of the command (0 for success, non-zero for failure)
         """
-        log.info(LOG_PREFIX_JOB + " Executing command via OSCAR: %s", job_name, " ".join(command))
-        log.debug(LOG_PREFIX_JOB + " Working directory: %s", job_name, working_directory)
-        log.debug(LOG_PREFIX_JOB + " Environment variables: %s", job_name, environment)
-        
-        # Determine service name dynamically
+        job_log = JobLogAdapter(log, job_name)
+        job_log.info("Executing command via OSCAR: %s", " ".join(command))
+        job_log.debug("Working directory: %s", working_directory)
+        job_log.debug("Environment variables: %s", environment)
+        
+        # Determine service name dynamically; the service is looked up (or created) on the
+        # service manager's pool while the command script is written
+        service_future = None
         if self.service_manager and tool_spec:
-            log.debug("%s: " + LOG_PREFIX_JOB + " Using service manager to determine service for tool", LOG_PREFIX_EXECUTOR, job_name)
-            service_name = self.service_manager.get_or_create_service(tool_spec, job_name)
-            log.info("%s: " + LOG_PREFIX_JOB + " Service manager selected service: %s", LOG_PREFIX_EXECUTOR, job_name, service_name)
+            job_log.debug("%s: Using service manager to determine service for tool", LOG_PREFIX_EXECUTOR)
+            service_future = self.service_manager.get_or_create_service_async(tool_spec, job_name)
+            service_name = None
         else:
             # Fall back to default service
             service_name = "run-script-event2"
-            log.warning("%s: " + LOG_PREFIX_JOB + " No service manager or tool spec, using default service: %s", LOG_PREFIX_EXECUTOR, job_name, service_name)
+            job_log.warning("%s: No service manager or tool spec, using default service: %s", LOG_PREFIX_EXECUTOR, service_name)
         
         # Temporarily set service_name for this execution
         original_service_name = getattr(self, 'service_name', None)
-        self.service_name = service_name
         
+        temp_dir = None
         script_path = None
         output_path = None
         
         try:
-            # Create a temporary directory for scripts
-            temp_dir = tempfile.mkdtemp(prefix="cwl_oscar_")
+            # Per-job directory for the script and the exit code file, inside the run's spool
+            temp_dir = os.path.join(_spool_dir(), uuid.uuid4().hex)
+            os.mkdir(temp_dir)
             
             # Use provided job_id or create command script file with job-specific ID
             if job_id is None:
                 job_id = f"{job_name}_{int(time.time())}"
             
-            log.debug(LOG_PREFIX_JOB + " Using job_id: %s", job_name, job_id)
-            script_path = self.create_command_script(
-                command, environment, working_directory, stdout_file=stdout_file, output_dir=temp_dir, job_id=job_id, tool_spec=tool_spec
+            job_log.debug("Using job_id: %s", job_id)
+            script_name, script_content = self.build_command_script(
+                command, environment, stdout_file=stdout_file, job_id=job_id, tool_spec=tool_spec
             )
+            # Only written to disk if the input storage can't take the script from memory
+            script_path = os.path.join(temp_dir, script_name)
+            
+            if service_future is not None:
+                service_name = service_future.result()
+                job_log.info("%s: Service manager selected service: %s", LOG_PREFIX_EXECUTOR, service_name)
+            self.service_name = service_name
+            if service_future is not None:
+                self._ensure_service_exists(tool_spec, job_name, job_log)
+            
+            if self.batcher is not None and self.batcher.enabled:
+                return self._execute_batched(job_name, job_id, script_content)
             
             # Upload script and wait for output
-            log.info(LOG_PREFIX_JOB + " Submitting job to OSCAR service: %s", job_name, self.service_name)
-            output_file = self.upload_and_wait_for_output(script_path)
+            job_log.info("Submitting job to OSCAR service: %s", self.service_name)
+            output_file = self.upload_and_wait_for_output(script_path, content=script_content.encode('utf-8'))
             
             if output_file is None:
-                log.error(LOG_PREFIX_JOB + " Failed to get output file from OSCAR", job_name)
+                job_log.error("Failed to get output file from OSCAR")
                 return 1
             
-            # Download the output file
-            output_filename = os.path.basename(script_path) + OUTPUT_EXTENSION
-            output_path = os.path.join(temp_dir, output_filename)
-            
-            success = self.download_output_file(output_file['Key'], output_path)
-            if not success:
-                log.error(LOG_PREFIX_JOB + " Failed to download output file", job_name)
-                return 1
+            # The output only holds the exit code, a bounded read is enough; S3 providers
+            # stream it into memory, others download the file first
+            output_content = self.download_output_bytes(output_file['Key'], EXIT_CODE_MAX_BYTES)
+            if output_content is None:
+                output_filename = os.path.basename(script_path) + OUTPUT_EXTENSION
+                output_path = os.path.join(temp_dir, output_filename)
+                
+                success = self.download_output_file(output_file['Key'], output_path)
+                if not success:
+                    job_log.error("Failed to download output file")
+                    return 1
             
-            # Read the exit code from the output file
+            # Read the exit code from the output
             try:
-                with open(output_path, 'r') as f:
-                    output_content = f.read().strip()
+                if output_content is None:
+                    fd = os.open(output_path, os.O_RDONLY)
+                    try:
+                        output_content = os.read(fd, EXIT_CODE_MAX_BYTES)
+                    finally:
+                        os.close(fd)
+                output_content = output_content.strip()
                 
-                log.debug(LOG_PREFIX_JOB + " Exit code file content: '%s' (length: %d)", job_name, repr(output_content), len(output_content))
-                log.debug(LOG_PREFIX_JOB + " Exit code isdigit(): %s", job_name, output_content.isdigit())
+                if log.isEnabledFor(logging.DEBUG):
+                    job_log.debug("Exit code file content: %r (length: %d)", output_content, len(output_content))
                 
                 # The output file should contain the exit code
                 # For OSCAR script execution, it typically contains the exit code
-                if output_content.isdigit():
+                try:
                     exit_code = int(output_content)
-                    log.debug(LOG_PREFIX_JOB + " Parsed exit code as integer: %d", job_name, exit_code)
-                else:
-                    log.warning(LOG_PREFIX_JOB + " Exit code content is not a digit, defaulting to 0. Content: '%s'", job_name, repr(output_content))
+                except ValueError:
+                    job_log.warning("Exit code content is not a number, defaulting to 0. Content: %r", output_content)
                     exit_code = 0
                 
                 if exit_code == 0:
-                    log.info(LOG_PREFIX_JOB + " OSCAR job completed successfully", job_name)
+                    job_log.info("OSCAR job completed successfully")
                 else:
-                    log.warning(LOG_PREFIX_JOB + " OSCAR job completed with exit code %d", job_name, exit_code)
+                    job_log.warning("OSCAR job completed with exit code %d", exit_code)
                 
                 # Note: All outputs (including stdout) are now available in mount_path/job_id
                 # No need to download them separately as they're copied by the script
-                log.info(LOG_PREFIX_JOB + " All outputs have been copied to mount path by the script", job_name)
+                job_log.info("All outputs have been copied to mount path by the script")
                 
                 return exit_code
                 
             except (ValueError, IOError) as e:
-                log.warning(LOG_PREFIX_JOB + " Could not parse exit code from output: %s, assuming success", job_name, e)
+                job_log.warning("Could not parse exit code from output: %s, assuming success", e)
                 return 0
                 
         except Exception as e:
-            log.error(LOG_PREFIX_JOB + " Error executing command via OSCAR: %s", job_name, str(e))
+            job_log.error("Error executing command via OSCAR: %s", str(e))
             return 1
             
         finally:
@@ -431,14 +924,17 @@ class OSCARExecutor:
             if original_service_name:
                 self.service_name = original_service_name
             # Clean up temporary files
-            try:
-                if script_path and os.path.exists(script_path):
-                    os.remove(script_path)
-                if output_path and os.path.exists(output_path):
-                    os.remove(output_path)
-                # Clean up temp directory
-                temp_dir_path = os.path.dirname(script_path) if script_path else None
-                if temp_dir_path and os.path.exists(temp_dir_path):
-                    shutil.rmtree(temp_dir_path, ignore_errors=True)
-            except Exception as e:
-                log.debug(LOG_PREFIX_JOB + " Error cleaning up temporary files: %s", job_name, e)
+            for path in (script_path, output_path):
+                if path:
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        job_log.debug("Error cleaning up temporary files: %s", e)
+            if temp_dir is not None:
+                try:
+                    os.rmdir(temp_dir)
+                except OSError:
+                    # Providers without a boto3 client may leave a recreated remote layout behind
+                    shutil.rmtree(temp_dir, ignore_errors=True)
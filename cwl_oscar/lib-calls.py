@@ -6,6 +6,7 @@
 from oscar_python.client import Client
 import json
 import os
+import random
 import time
 import uuid
 from typing import Optional
@@ -61,7 +62,10 @@ def upload_and_wait_for_output(
     timeout_seconds: int = 300,
     check_interval: int = 5
 ) -> Optional[dict]:
-    """Upload a file to OSCAR service input and wait for the corresponding output file."""
+    """Upload a file to OSCAR service input and wait for the corresponding output file.
+    
+    Checks start 0.1s apart and back off exponentially (with jitter) up to check_interval.
+    """
     
     file_name = os.path.basename(local_file_path)
     expected_output_name = file_name + '.output'
@@ -80,6 +84,7 @@ def upload_and_wait_for_output(
     
     # Wait for the output file
     start_time = time.time()
+    delay = 0.1
     while time.time() - start_time < timeout_seconds:
         try:
             files = storage_service.list_files_from_path(out_provider, expected_output_path)
@@ -90,11 +95,11 @@ def upload_and_wait_for_output(
                         print(f"Output file found: {file_entry['Key']} ({file_entry['Size']} bytes)")
                         return file_entry
             
-            time.sleep(check_interval)
-            
         except Exception as e:
             print(f"Error checking for output: {e}")
-            time.sleep(check_interval)
+        
+        time.sleep(delay * random.uniform(0.8, 1.2))
+        delay = min(delay * 2, check_interval)
     
     print(f"Timeout: Output file not found after {timeout_seconds} seconds")
     return None
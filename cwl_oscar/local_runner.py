@@ -19,19 +19,70 @@ Usage:
 """
 
 import os
+import glob
 import json
 import time
 import tempfile
-import shutil
 import logging
+import random
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 try:
-    from oscar_python.client import Client
+    from constants import SCHEDULING_POLICIES, SCHEDULING_ROUND_ROBIN
+    from utils import forget_storage_clients, get_provider_client, json_loads
 except ImportError:
-    raise ImportError("oscar-python package is required. Install with: pip install oscar-python")
+    from .constants import SCHEDULING_POLICIES, SCHEDULING_ROUND_ROBIN
+    from .utils import forget_storage_clients, get_provider_client, json_loads
 
 log = logging.getLogger("cwl-oscar-local")
 
+# OSCAR clients shared by every runner that targets the same cluster with the same credentials
+_CLIENT_CACHE = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+# Maximum number of concurrent transfers to/from OSCAR storage
+MAX_TRANSFER_WORKERS = 8
+
+# Additional files are bundled into one tar upload when at least this many are small enough
+BUNDLE_MIN_FILES = 4
+BUNDLE_MAX_FILE_SIZE = 10 * 1024 * 1024  # bytes; larger files are uploaded on their own
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.xz', '.zst', '.zip', '.bam', '.cram', '.png', '.jpg')
+
+# How long a fetched service list is reused before asking the cluster again
+SERVICE_CONFIG_TTL = 300  # seconds
+
+# Back-to-back listings of the same path within this window reuse the first response
+LIST_CACHE_TTL = 1.0  # seconds
+
+# Completion polling backs off from POLL_INITIAL_DELAY up to the caller's max interval
+POLL_INITIAL_DELAY = 0.5  # seconds
+POLL_MAX_DELAY = 30.0  # seconds
+POLL_BACKOFF_FACTOR = 1.5
+
+
+def _iter_keys(files):
+    """
+    Yield the object keys of a storage listing, skipping directory entries.
+
+    Accepts both S3-style responses ({'Contents': [...]}) and plain lists of
+    keys or {'Key': ...} dicts; anything else yields nothing.
+    """
+    if isinstance(files, dict):
+        files = files.get('Contents', [])
+    elif not isinstance(files, list):
+        return
+    for file_info in files:
+        file_key = file_info.get('Key') if isinstance(file_info, dict) else file_info
+        if isinstance(file_key, str) and not file_key.endswith('/'):
+            yield file_key
+
+
+def _find_key(files, expected_keys):
+    """Return the first key in a storage listing that is one of expected_keys, or None."""
+    return next((file_key for file_key in _iter_keys(files) if file_key in expected_keys), None)
+
 
 class OSCARLocalRunner:
     """Local runner for CWL workflows on OSCAR infrastructure."""
@@ -50,10 +101,21 @@ class OSCARLocalRunner:
         self.clusters = clusters
         self.primary_cluster = clusters[0]  # Use first cluster for service operations
         self.mount_path = mount_path
+        # Storage path of the mount: drop the leading slash and 'mnt' from mount_path
+        mount_parts = mount_path.strip('/').split('/')
+        if mount_parts[0] == 'mnt':
+            mount_parts = mount_parts[1:]
+        self._mount_storage_path = '/'.join(mount_parts)
         self.cwl_oscar_service = cwl_oscar_service
         self.shared_minio_config = shared_minio_config
         self.client = None
         self.storage_service = None
+        self._script_cluster_args = None  # Run script argument lines built from the cluster config
+        self._services_by_name = None  # Cached service list, keyed by service name
+        self._services_fetched_at = None  # None means the cached list must be fetched again
+        self._list_cache = {}  # (provider, path) -> (monotonic time, listing)
+        self._results_listing = None  # Future for the output listing started when a run completes
+        self._init_lock = threading.Lock()
 
         # Expose primary cluster properties for compatibility
         self.oscar_endpoint = self.primary_cluster['endpoint']
@@ -65,46 +127,114 @@ class OSCARLocalRunner:
     def get_client(self):
         """Get or create OSCAR client."""
         if self.client is None:
-            if self.oscar_token:
-                # Use OIDC token authentication
-                options = {
-                    'cluster_id': 'oscar-cluster',
-                    'endpoint': self.oscar_endpoint,
-                    'oidc_token': self.oscar_token,
-                    'ssl': str(self.ssl)
-                }
-            else:
-                # Use basic username/password authentication
-                options = {
-                    'cluster_id': 'oscar-cluster',
-                    'endpoint': self.oscar_endpoint,
-                    'user': self.oscar_username,
-                    'password': self.oscar_password,
-                    'ssl': str(self.ssl)
-                }
-            self.client = Client(options=options)
+            with self._init_lock:
+                if self.client is None:
+                    self.client = self._create_client()
         return self.client
 
+    def _create_client(self):
+        """
+        Get the OSCAR client for the primary cluster, shared across runner instances.
+
+        Runners with the same endpoint and credentials reuse one client (and the
+        storage credentials it fetched). A client whose token has been revoked or
+        rotated server-side stays cached until invalidate_client() is called.
+        """
+        options = self._client_options()
+        cache_key = tuple(sorted(options.items()))
+        with _CLIENT_CACHE_LOCK:
+            client = _CLIENT_CACHE.get(cache_key)
+            if client is None:
+                # Imported here so CLI paths that never talk to OSCAR (e.g. --help) skip its cost
+                try:
+                    from oscar_python.client import Client
+                except ImportError:
+                    raise ImportError("oscar-python package is required. Install with: pip install oscar-python")
+                client = _CLIENT_CACHE[cache_key] = Client(options=options)
+        return client
+
+    def invalidate_client(self):
+        """Drop the cached OSCAR client and everything derived from it for this cluster."""
+        cache_key = tuple(sorted(self._client_options().items()))
+        with _CLIENT_CACHE_LOCK:
+            _CLIENT_CACHE.pop(cache_key, None)
+        with self._init_lock:
+            if self.client is not None:
+                forget_storage_clients(self.client)
+            self.client = None
+            self.storage_service = None
+        self._services_by_name = None
+        self._services_fetched_at = None
+
+    def _client_options(self):
+        """Build the OSCAR client options for the primary cluster."""
+        if self.oscar_token:
+            # Use OIDC token authentication
+            options = {
+                'cluster_id': 'oscar-cluster',
+                'endpoint': self.oscar_endpoint,
+                'oidc_token': self.oscar_token,
+                'ssl': str(self.ssl)
+            }
+        else:
+            # Use basic username/password authentication
+            options = {
+                'cluster_id': 'oscar-cluster',
+                'endpoint': self.oscar_endpoint,
+                'user': self.oscar_username,
+                'password': self.oscar_password,
+                'ssl': str(self.ssl)
+            }
+        return options
+
     def get_storage_service(self):
         """Get or create storage service."""
         if self.storage_service is None:
-            self.storage_service = self.get_client().create_storage_client()
+            client = self.get_client()
+            with self._init_lock:
+                if self.storage_service is None:
+                    self.storage_service = client.create_storage_client()
         return self.storage_service
 
+    def get_provider_client(self, provider):
+        """
+        Get the client for a single storage provider (e.g. "minio.default").
+
+        The storage service builds a new boto3 client on every call, and boto3's
+        default session is not thread-safe, so concurrent transfers share the
+        client kept by utils.get_provider_client instead.
+        """
+        return get_provider_client(self.get_client(), provider)
+
     def get_service_config(self, service_name):
-        """Get configuration for a specific service."""
-        client = self.get_client()
-        services_response = client.list_services()
+        """
+        Get configuration for a specific service.
 
-        if services_response.status_code != 200:
-            raise Exception(f"Failed to list services: {services_response.text}")
+        The service list is cached for SERVICE_CONFIG_TTL seconds; a name that is
+        missing from a cached list triggers one fresh fetch before giving up.
+        """
+        is_fresh = self._services_fetched_at is None or \
+            time.monotonic() - self._services_fetched_at >= SERVICE_CONFIG_TTL
+        services = self._fetch_services() if is_fresh else self._services_by_name
 
-        services = json.loads(services_response.text)
-        for service in services:
-            if service.get('name') == service_name:
-                return service
+        service = services.get(service_name)
+        if service is None and not is_fresh:
+            service = self._fetch_services().get(service_name)
+        if service is None:
+            raise Exception(f"Service {service_name} not found")
+        return service
 
-        raise Exception(f"Service {service_name} not found")
+    def _fetch_services(self):
+        """List the cluster's services and cache them by name."""
+        services_response = self.get_client().list_services()
+        services = json_loads(services_response.content)
+        self._services_by_name = {service.get('name'): service for service in services}
+        self._services_fetched_at = time.monotonic()
+        return self._services_by_name
+
+    def refresh_services(self):
+        """Mark the cached service list as stale so the next lookup fetches it again."""
+        self._services_fetched_at = None
 
     def upload_file_to_mount(self, local_path, remote_filename=None):
         """
@@ -123,18 +253,15 @@ class OSCARLocalRunner:
         if remote_filename is None:
             remote_filename = os.path.basename(local_path)
 
-        # Remove leading slash and 'mnt' from mount_path to get storage path
-        mount_parts = self.mount_path.strip('/').split('/')
-        if mount_parts[0] == 'mnt':
-            mount_parts = mount_parts[1:]
-        storage_path = '/'.join(mount_parts)
+        storage_path = self._mount_storage_path
 
         log.info("Uploading %s to %s/%s", local_path, storage_path, remote_filename)
 
-        storage_service = self.get_storage_service()
-        # upload_file expects: provider, local_file_path, remote_directory_path
+        provider_client = self.get_provider_client("minio.default")
+        # upload_file expects: local_file_path, remote_directory_path
         # It automatically uses the original filename
-        storage_service.upload_file("minio.default", local_path, storage_path)
+        provider_client.upload_file(local_path, storage_path)
+        self._list_cache.clear()
 
         return f"{self.mount_path}/{remote_filename}"
 
@@ -150,22 +277,78 @@ class OSCARLocalRunner:
         Returns:
             Dict with remote paths for uploaded files
         """
-        uploaded_files = {}
+        additional_files = list(additional_files or [])
+
+        # Check every local file before the first upload so a typo fails fast
+        file_sizes = {}
+        missing = []
+        for file_path in [workflow_path, input_path] + additional_files:
+            try:
+                file_sizes[file_path] = os.stat(file_path).st_size
+            except FileNotFoundError:
+                missing.append(file_path)
+        if missing:
+            raise FileNotFoundError(f"Local file(s) not found: {', '.join(missing)}")
+
+        # Many small files cost one request each; send them as a single tar instead
+        small_files = [p for p in additional_files if file_sizes[p] <= BUNDLE_MAX_FILE_SIZE]
+        if len(small_files) < BUNDLE_MIN_FILES:
+            small_files = []
+        local_paths = [workflow_path, input_path] + [p for p in additional_files if p not in small_files]
 
-        # Upload workflow file
-        uploaded_files['workflow'] = self.upload_file_to_mount(workflow_path)
+        bundle_path = self._create_bundle(small_files) if small_files else None
+        if bundle_path:
+            local_paths.append(bundle_path)
 
-        # Upload input file
-        uploaded_files['input'] = self.upload_file_to_mount(input_path)
+        # Resolve the shared provider client before fanning out so threads don't race its creation
+        self.get_provider_client("minio.default")
 
-        # Upload additional files if provided
+        # Uploads are independent network round trips, so overlap them;
+        # map() keeps the results in input order and re-raises the first failure
+        try:
+            with ThreadPoolExecutor(max_workers=min(MAX_TRANSFER_WORKERS, len(local_paths))) as pool:
+                remote_paths = dict(zip(local_paths, pool.map(self.upload_file_to_mount, local_paths)))
+        finally:
+            if bundle_path:
+                os.remove(bundle_path)
+
+        uploaded_files = {
+            'workflow': remote_paths[workflow_path],
+            'input': remote_paths[input_path],
+        }
         if additional_files:
-            uploaded_files['additional'] = []
-            for file_path in additional_files:
-                remote_path = self.upload_file_to_mount(file_path)
-                uploaded_files['additional'].append(remote_path)
+            uploaded_files['additional'] = [
+                remote_paths.get(p, f"{self.mount_path}/{os.path.basename(p)}") for p in additional_files
+            ]
+        if bundle_path:
+            uploaded_files['bundle'] = remote_paths[bundle_path]
                 
         return uploaded_files
+
+    def _create_bundle(self, file_paths):
+        """
+        Pack files into a temporary tar archive for a single upload.
+
+        Files keep only their base name, matching where individual uploads land
+        in the mount. The archive is gzip-compressed unless every file is
+        already compressed.
+
+        Args:
+            file_paths: Local files to bundle
+
+        Returns:
+            Path to the temporary archive (the caller removes it)
+        """
+        already_compressed = all(p.lower().endswith(COMPRESSED_EXTENSIONS) for p in file_paths)
+        suffix, mode = ('.tar', 'w') if already_compressed else ('.tar.gz', 'w:gz')
+        bundle_fd, bundle_path = tempfile.mkstemp(suffix=suffix, prefix='cwl_oscar_bundle_')
+        os.close(bundle_fd)
+        import tarfile
+        with tarfile.open(bundle_path, mode) as tar:
+            for file_path in file_paths:
+                tar.add(file_path, arcname=os.path.basename(file_path))
+        log.info("Bundled %d additional files into %s", len(file_paths), os.path.basename(bundle_path))
+        return bundle_path
         
     def _convert_endpoint_for_script(self, endpoint):
         """
@@ -182,85 +365,227 @@ class OSCARLocalRunner:
             return 'http://oscar.oscar.svc.cluster.local:8080'
         return endpoint
 
-    def create_run_script(self, workflow_remote_path, input_remote_path, additional_args=None):
+    def _get_script_cluster_args(self):
         """
-        Create a run script for executing the workflow on OSCAR.
+        Build the cluster, shared MinIO and service argument lines of the run script.
         
-        Args:
-            workflow_remote_path: Remote path to workflow file
-            input_remote_path: Remote path to input file
-            additional_args: Optional additional arguments for cwl-oscar
-            
-        Returns:
-            Path to created run script
+        These only depend on the runner configuration, so they are built once and reused.
         """
-        script_content = "#!/bin/bash\n\n"
-        script_content += "/usr/local/bin/python /app/cwl-oscar \\\n"
+        if self._script_cluster_args is not None:
+            return self._script_cluster_args
         
-        # Add cluster configurations
-        for cluster in self.clusters:
+        parts = []
+        # Add cluster configurations; secrets come from the service environment, see _service_secrets
+        for index, cluster in enumerate(self.clusters, start=1):
             # * Convert localhost endpoints to internal Kubernetes service endpoints
             script_endpoint = self._convert_endpoint_for_script(cluster['endpoint'])
             if script_endpoint != cluster['endpoint']:
                 log.info("Converting endpoint for script: %s -> %s", cluster['endpoint'], script_endpoint)
-            script_content += f"  --cluster-endpoint {script_endpoint} \\\n"
+            parts.append(f"  --cluster-endpoint {script_endpoint} \\\n")
             if cluster.get('token'):
-                script_content += f"  --cluster-token {cluster['token']} \\\n"
+                parts.append(f"  --cluster-token \"$CWL_OSCAR_CLUSTER_{index}_TOKEN\" \\\n")
             else:
-                script_content += f"  --cluster-username {cluster['username']} \\\n"
-                script_content += f"  --cluster-password {cluster['password']} \\\n"
+                parts.append(f"  --cluster-username {cluster['username']} \\\n")
+                parts.append(f"  --cluster-password \"$CWL_OSCAR_CLUSTER_{index}_PASSWORD\" \\\n")
             if not cluster.get('ssl', True):
-                script_content += f"  --cluster-disable-ssl \\\n"
+                parts.append("  --cluster-disable-ssl \\\n")
             if cluster.get('steps'):
                 steps_str = ','.join(cluster['steps'])
-                script_content += f"  --cluster-steps {steps_str} \\\n"
+                parts.append(f"  --cluster-steps {steps_str} \\\n")
+            if cluster.get('weight', 1) != 1:
+                parts.append(f"  --cluster-weight {cluster['weight']} \\\n")
         
         # Add shared MinIO configuration for multi-cluster
         if len(self.clusters) > 1 and self.shared_minio_config:
-            script_content += f"  --shared-minio-endpoint {self.shared_minio_config['endpoint']} \\\n"
-            script_content += f"  --shared-minio-access-key {self.shared_minio_config['access_key']} \\\n"
-            script_content += f"  --shared-minio-secret-key {self.shared_minio_config['secret_key']} \\\n"
+            parts.append(f"  --shared-minio-endpoint {self.shared_minio_config['endpoint']} \\\n")
+            parts.append(f"  --shared-minio-access-key {self.shared_minio_config['access_key']} \\\n")
+            parts.append("  --shared-minio-secret-key \"$CWL_OSCAR_SHARED_MINIO_SECRET_KEY\" \\\n")
             if self.shared_minio_config.get('region'):
-                script_content += f"  --shared-minio-region {self.shared_minio_config['region']} \\\n"
+                parts.append(f"  --shared-minio-region {self.shared_minio_config['region']} \\\n")
             if not self.shared_minio_config.get('verify_ssl', True):
-                script_content += f"  --shared-minio-disable-ssl \\\n"
+                parts.append("  --shared-minio-disable-ssl \\\n")
+            
+        parts.append(f"  --mount-path {self.mount_path} \\\n")
+        parts.append(f"  --service-name {self.cwl_oscar_service} \\\n")
+        
+        self._script_cluster_args = parts
+        return parts
+        
+    def _service_secrets(self):
+        """
+        Secrets the run script passes to cwl-oscar, by environment variable name.
+        
+        They are stored as secrets of the cwl-oscar service, so OSCAR sets them in
+        the environment of its jobs and they never appear in the run script or on
+        the mount shared with every step service.
+        """
+        secrets = {}
+        for index, cluster in enumerate(self.clusters, start=1):
+            if cluster.get('token'):
+                secrets[f'CWL_OSCAR_CLUSTER_{index}_TOKEN'] = cluster['token']
+            else:
+                secrets[f'CWL_OSCAR_CLUSTER_{index}_PASSWORD'] = cluster['password']
+        if len(self.clusters) > 1 and self.shared_minio_config:
+            secrets['CWL_OSCAR_SHARED_MINIO_SECRET_KEY'] = self.shared_minio_config['secret_key']
+        return secrets
+        
+    def update_service_secrets(self, service_config):
+        """
+        Store the current secrets on an existing cwl-oscar service if they changed.
+        
+        Args:
+            service_config: Service definition as listed by the cluster; updated in place
+        """
+        environment = service_config.get('environment') or {}
+        secrets = self._service_secrets()
+        if (environment.get('secrets') or {}) == secrets:
+            return
+        log.info("Updating the secrets of service '%s'", service_config['name'])
+        environment = dict(environment, secrets=secrets)
+        self.get_client().update_service(service_config['name'], dict(service_config, environment=environment))
+        service_config['environment'] = environment
+        
+    @contextmanager
+    def create_run_script(self, workflow_remote_path, input_remote_path, additional_args=None,
+                          bundle_remote_path=None):
+        """
+        Create a run script for executing the workflow on OSCAR.
+        
+        Used as a context manager; the local script is removed on exit.
+        
+        Args:
+            workflow_remote_path: Remote path to workflow file
+            input_remote_path: Remote path to input file
+            additional_args: Optional additional arguments for cwl-oscar
+            bundle_remote_path: Optional remote path to a tar bundle of additional files
             
-        script_content += f"  --mount-path {self.mount_path} \\\n"
-        script_content += f"  --service-name {self.cwl_oscar_service} \\\n"
+        Yields:
+            Path to created run script
+        """
+        parts = ["#!/bin/bash\n\n"]
+        if bundle_remote_path:
+            # Unpack bundled additional files next to the other uploads before running
+            bundle_dir = os.path.dirname(bundle_remote_path)
+            parts.append(f"tar -xf {bundle_remote_path} -C {bundle_dir} && rm -f {bundle_remote_path}\n\n")
+        parts.append("/usr/local/bin/python /app/cwl-oscar \\\n")
+        parts.extend(self._get_script_cluster_args())
         
         if additional_args:
             for arg in additional_args:
-                script_content += f"  {arg} \\\n"
+                parts.append(f"  {arg} \\\n")
                 
-        script_content += f"  {workflow_remote_path} \\\n"
-        script_content += f"  {input_remote_path}\n"
+        parts.append(f"  {workflow_remote_path} \\\n")
+        parts.append(f"  {input_remote_path}\n")
+        script_content = "".join(parts)
         
         # Create temporary script file
-        script_fd, script_path = tempfile.mkstemp(suffix='.sh', prefix='cwl_oscar_run_')
-        with os.fdopen(script_fd, 'w') as f:
+        with tempfile.NamedTemporaryFile('w', suffix='.sh', prefix='cwl_oscar_run_', delete=False) as f:
             f.write(script_content)
+            script_path = f.name
+            
+        try:
+            os.chmod(script_path, 0o700)
+            
+            log.debug("Created run script: %s", script_path)
+            log.debug("Script content:\n%s", script_content)
+            
+            yield script_path
+        finally:
+            os.remove(script_path)
+        
+    def _list_files(self, storage_service, provider, path):
+        """
+        List a storage path, reusing a listing of the same path taken less than
+        LIST_CACHE_TTL seconds ago. Uploads and deletes clear the cache.
+        """
+        now = time.monotonic()
+        entry = self._list_cache.get((provider, path))
+        if entry is not None and now - entry[0] < LIST_CACHE_TTL:
+            return entry[1]
+        files = storage_service.list_files_from_path(provider, path)
+        self._list_cache[(provider, path)] = (now, files)
+        return files
+        
+    def read_remote_file(self, provider, remote_path):
+        """
+        Read a small object from storage straight into memory.
+        
+        Args:
+            provider: Storage provider name (e.g. 'minio.default')
+            remote_path: Remote path as 'bucket/key'
             
-        os.chmod(script_path, 0o755)
+        Returns:
+            Object content as bytes
+        """
+        bucket, key = remote_path.split('/', 1)
+        s3_client = getattr(self.get_provider_client(provider), 'client', None)
+        if s3_client is not None and hasattr(s3_client, 'get_object'):
+            return s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
         
-        log.debug("Created run script: %s", script_path)
-        log.debug("Script content:\n%s", script_content)
+        # Providers without a boto3 client only offer file downloads
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.get_storage_service().download_file(provider, temp_dir, remote_path)
+            filename = os.path.basename(remote_path)
+            try:
+                with open(os.path.join(temp_dir, filename), 'rb') as f:
+                    return f.read()
+            except FileNotFoundError:
+                pass
+            # Some providers recreate the remote directory layout under temp_dir
+            nested = glob.glob(os.path.join(glob.escape(temp_dir), '**', glob.escape(filename)), recursive=True)
+            if not nested:
+                raise FileNotFoundError(f"Downloaded file not found for {remote_path}")
+            with open(nested[0], 'rb') as f:
+                return f.read()
         
-        return script_path
+    def object_exists(self, provider, remote_path):
+        """
+        Check whether an object exists in storage with a HEAD request.
         
-    def submit_and_wait(self, script_path, timeout_seconds=600, check_interval=10):
+        Args:
+            provider: Storage provider name (e.g. 'minio.default')
+            remote_path: Remote path as 'bucket/key'
+            
+        Returns:
+            True or False, or None if the provider cannot answer HEAD requests
+        """
+        bucket, key = remote_path.split('/', 1)
+        s3_client = getattr(self.get_provider_client(provider), 'client', None)
+        if s3_client is None or not hasattr(s3_client, 'head_object'):
+            return None
+        try:
+            s3_client.head_object(Bucket=bucket, Key=key)
+            return True
+        except Exception as e:
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        
+    def submit_and_wait(self, script_path, timeout_seconds=600, max_interval=POLL_MAX_DELAY,
+                        service_config=None, storage_service=None):
         """
         Submit run script to cwl-oscar service and wait for completion.
         
+        The exit code object is checked with HEAD requests using exponential backoff
+        (plus jitter), starting at POLL_INITIAL_DELAY and growing to max_interval.
+        Backends without HEAD support fall back to listing the output directory,
+        and the delay goes back to the start whenever that listing changes.
+        
         Args:
             script_path: Path to run script
             timeout_seconds: Maximum wait time
-            check_interval: How often to check for completion
+            max_interval: Longest pause between completion checks
+            service_config: cwl-oscar service configuration (fetched if not given)
+            storage_service: OSCAR storage client (created if not given)
             
         Returns:
             True if successful, False otherwise
         """
-        service_config = self.get_service_config(self.cwl_oscar_service)
-        storage_service = self.get_storage_service()
+        if service_config is None:
+            service_config = self.get_service_config(self.cwl_oscar_service)
+        if storage_service is None:
+            storage_service = self.get_storage_service()
         
         # Extract service paths
         in_provider = service_config['input'][0]['storage_provider']
@@ -270,125 +595,96 @@ class OSCARLocalRunner:
         
         script_name = os.path.basename(script_path)
         expected_output = f"{script_name}.exit_code"
+        # Listings may report keys relative to the bucket, the service path or the directory
+        out_dir = out_path.split('/', 1)[1] if '/' in out_path else ''
+        expected_keys = {
+            expected_output,
+            f"out/{expected_output}",
+            f"{out_dir}/{expected_output}",
+            f"{out_path}/{expected_output}",
+        }
         
         log.info("Submitting workflow to OSCAR service: %s", self.cwl_oscar_service)
         log.info("Expected completion file: %s", expected_output)
         
         # Check if exit code file already exists and remove it
         try:
-            existing_files = storage_service.list_files_from_path(out_provider, out_path + "/")
-            if isinstance(existing_files, dict) and 'Contents' in existing_files:
-                for file_info in existing_files['Contents']:
-                    if file_info['Key'].endswith(expected_output):
-                        log.info("Removing old exit code file: %s", file_info['Key'])
-                        storage_service.delete_file(out_provider, file_info['Key'])
-            elif isinstance(existing_files, list):
-                for file_info in existing_files:
-                    file_key = file_info.get('Key', file_info) if isinstance(file_info, dict) else file_info
-                    if file_key.endswith(expected_output):
-                        log.info("Removing old exit code file: %s", file_key)
-                        storage_service.delete_file(out_provider, file_key)
+            existing_files = self._list_files(storage_service, out_provider, out_path + "/")
+            old_exit_code_key = _find_key(existing_files, expected_keys)
+            if old_exit_code_key:
+                log.info("Removing old exit code file: %s", old_exit_code_key)
+                self._list_cache.clear()
+                storage_service.delete_file(out_provider, old_exit_code_key)
         except Exception as e:
             log.debug("Could not check/clean old exit code files: %s", e)
         
         # Upload run script
         storage_service.upload_file(in_provider, script_path, in_path)
+        self._list_cache.clear()
         
         log.info("Waiting for workflow completion (max %ds)...", timeout_seconds)
         
         # Wait for completion
         start_time = time.time()
+        delay = POLL_INITIAL_DELAY
+        last_listing_size = None
+        exit_code_remote_path = out_path + '/' + expected_output
         while time.time() - start_time < timeout_seconds:
             try:
-                files = storage_service.list_files_from_path(out_provider, out_path + "/")
-                completion_found = False
-                
-                if isinstance(files, dict) and 'Contents' in files:
-                    # Handle AWS S3-style response
-                    for file_info in files['Contents']:
-                        if file_info['Key'].endswith(expected_output):
-                            log.info("Found completion file: %s", file_info['Key'])
-                            completion_found = True
-                            break
-                elif isinstance(files, list):
-                    # Handle list response
-                    for file_info in files:
-                        file_key = file_info.get('Key', file_info) if isinstance(file_info, dict) else file_info
-                        if file_key.endswith(expected_output):
-                            log.info("Found completion file: %s", file_key)
-                            completion_found = True
-                            break
+                full_remote_path = None
+                exists = self.object_exists(out_provider, exit_code_remote_path)
+                if exists:
+                    log.info("Found completion file: %s", exit_code_remote_path)
+                    full_remote_path = exit_code_remote_path
+                elif exists is None:
+                    # No HEAD support on this backend, list the output directory instead;
+                    # always a fresh listing, as polls can be closer together than LIST_CACHE_TTL
+                    files = storage_service.list_files_from_path(out_provider, out_path + "/")
+                    
+                    # New output showing up means the job is moving; check again soon
+                    listing_size = sum(1 for _ in _iter_keys(files))
+                    if listing_size != last_listing_size:
+                        if last_listing_size is not None:
+                            delay = POLL_INITIAL_DELAY
+                        last_listing_size = listing_size
+                    
+                    exit_code_file_key = _find_key(files, expected_keys)
+                    if exit_code_file_key:
+                        log.info("Found completion file: %s", exit_code_file_key)
+                        # Construct full remote path like download_results does
+                        if exit_code_file_key.startswith('out/'):
+                            # Remove 'out/' prefix and combine with service out path
+                            file_only = exit_code_file_key[4:]  # Remove 'out/' prefix
+                            full_remote_path = out_path + '/' + file_only
+                        else:
+                            # Use as-is if it doesn't start with 'out/'
+                            full_remote_path = out_path + '/' + exit_code_file_key
                 
-                if completion_found:
+                if full_remote_path:
                     log.info("Workflow completed, checking exit code...")
+                    # List the results in the background while the exit code is read
+                    provider_client = self.get_provider_client(out_provider)
+                    prefetch_pool = ThreadPoolExecutor(max_workers=1)
+                    self._results_listing = prefetch_pool.submit(
+                        provider_client.list_files_from_path, out_path + "/")
+                    prefetch_pool.shutdown(wait=False)
                     # Download and check the exit code
                     try:
-                        # Find the actual exit code file path
-                        exit_code_file_key = None
-                        if isinstance(files, dict) and 'Contents' in files:
-                            for file_info in files['Contents']:
-                                if file_info['Key'].endswith(expected_output):
-                                    exit_code_file_key = file_info['Key']
-                                    break
-                        elif isinstance(files, list):
-                            for file_info in files:
-                                file_key = file_info.get('Key', file_info) if isinstance(file_info, dict) else file_info
-                                if file_key.endswith(expected_output):
-                                    exit_code_file_key = file_key
-                                    break
+                        log.debug("Reading exit code file: provider=%s, path=%s", out_provider, full_remote_path)
+                        exit_code_content = self.read_remote_file(out_provider, full_remote_path).decode().strip()
                         
-                        if exit_code_file_key:
-                            # Download the exit code file to a temporary location
-                            temp_dir = tempfile.mkdtemp()
-                            try:
-                                # Construct full remote path like download_results does
-                                if exit_code_file_key.startswith('out/'):
-                                    # Remove 'out/' prefix and combine with service out path
-                                    file_only = exit_code_file_key[4:]  # Remove 'out/' prefix
-                                    full_remote_path = out_path + '/' + file_only
-                                else:
-                                    # Use as-is if it doesn't start with 'out/'
-                                    full_remote_path = out_path + '/' + exit_code_file_key
-                                
-                                log.debug("Downloading exit code file: provider=%s, path=%s", out_provider, full_remote_path)
-                                storage_service.download_file(out_provider, temp_dir, full_remote_path)
-                                
-                                # Find the downloaded file
-                                downloaded_file = None
-                                for root, dirs, files in os.walk(temp_dir):
-                                    for f in files:
-                                        if f.endswith('.exit_code'):
-                                            downloaded_file = os.path.join(root, f)
-                                            break
-                                    if downloaded_file:
-                                        break
-                                
-                                if downloaded_file and os.path.exists(downloaded_file):
-                                    # Read the exit code
-                                    with open(downloaded_file, 'r') as f:
-                                        exit_code_content = f.read().strip()
-                                    
-                                    log.info("Exit code file content: '%s'", exit_code_content)
-                                    
-                                    if exit_code_content.isdigit():
-                                        exit_code = int(exit_code_content)
-                                        if exit_code == 0:
-                                            log.info("Workflow completed successfully (exit code: 0)")
-                                            return True
-                                        else:
-                                            log.error("Workflow failed with exit code: %d", exit_code)
-                                            return False
-                                    else:
-                                        log.warning("Invalid exit code format: '%s', treating as failure", exit_code_content)
-                                        return False
-                                else:
-                                    log.warning("Could not find downloaded exit code file, treating as failure")
-                                    return False
-                            finally:
-                                # Clean up temp directory
-                                shutil.rmtree(temp_dir, ignore_errors=True)
+                        log.info("Exit code file content: '%s'", exit_code_content)
+                        
+                        if exit_code_content.isdigit():
+                            exit_code = int(exit_code_content)
+                            if exit_code == 0:
+                                log.info("Workflow completed successfully (exit code: 0)")
+                                return True
+                            else:
+                                log.error("Workflow failed with exit code: %d", exit_code)
+                                return False
                         else:
-                            log.warning("Could not determine exit code file path, treating as failure")
+                            log.warning("Invalid exit code format: '%s', treating as failure", exit_code_content)
                             return False
                             
                     except Exception as e:
@@ -398,26 +694,45 @@ class OSCARLocalRunner:
             except Exception as e:
                 log.debug("Error checking for completion: %s", e)
                 
-            log.debug("Waiting for completion... (%ds elapsed)", int(time.time() - start_time))
-            time.sleep(check_interval)
+            elapsed = time.time() - start_time
+            log.debug("Waiting for completion... (%ds elapsed, next check in %.1fs)", int(elapsed), delay)
+            time.sleep(max(0.0, min(delay * random.uniform(0.8, 1.2), timeout_seconds - elapsed)))
+            delay = min(delay * POLL_BACKOFF_FACTOR, max_interval)
             
         log.error("Workflow timed out after %d seconds", timeout_seconds)
         return False
         
-    def download_results(self, output_dir="./results"):
+    def _take_results_listing(self):
+        """Return the output listing prefetched by submit_and_wait, or None if unavailable."""
+        future, self._results_listing = self._results_listing, None
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            log.debug("Prefetched results listing failed, listing again: %s", e)
+            return None
+        
+    def download_results(self, output_dir="./results", service_config=None, storage_service=None,
+                         prefetched_listing=None):
         """
         Download workflow results from OSCAR output storage.
         
         Args:
             output_dir: Local directory to download results to
+            service_config: cwl-oscar service configuration (fetched if not given)
+            storage_service: OSCAR storage client (created if not given)
+            prefetched_listing: Output listing taken when the run completed (listed if not given)
             
         Returns:
             Path to downloaded results directory
         """
         os.makedirs(output_dir, exist_ok=True)
         
-        service_config = self.get_service_config(self.cwl_oscar_service)
-        storage_service = self.get_storage_service()
+        if service_config is None:
+            service_config = self.get_service_config(self.cwl_oscar_service)
+        if storage_service is None:
+            storage_service = self.get_storage_service()
         
         out_provider = service_config['output'][0]['storage_provider']
         out_path = service_config['output'][0]['path']  # e.g., "cwl-oscar/out"
@@ -426,83 +741,69 @@ class OSCARLocalRunner:
         
         try:
             # List all files in output path
-            files = storage_service.list_files_from_path(out_provider, out_path + "/")
+            if prefetched_listing is not None:
+                files = prefetched_listing
+            else:
+                files = storage_service.list_files_from_path(out_provider, out_path + "/")
             
-            if isinstance(files, dict) and 'Contents' in files:
-                # Handle AWS S3-style response with Contents key
-                for file_info in files['Contents']:
-                    if isinstance(file_info, dict) and 'Key' in file_info:
-                        file_key = file_info['Key']  # e.g., "out/cwl_oscar_run_xxx.sh.exit_code"
-                        # Skip directory entries
-                        if file_key.endswith('/'):
-                            continue
-                            
-                        filename = os.path.basename(file_key)
-                        
-                        # Construct full download path
-                        # The file_key is relative to bucket root, but we need the full path
-                        # out_path is like "cwl-oscar/out", file_key is like "out/filename"
-                        # We need to combine them properly to get "cwl-oscar/out/filename"
-                        if file_key.startswith('out/'):
-                            # Remove 'out/' prefix and combine with service out path
-                            file_only = file_key[4:]  # Remove 'out/' prefix
-                            full_remote_path = out_path + '/' + file_only
-                        else:
-                            # Use as-is if it doesn't start with 'out/'
-                            full_remote_path = out_path + '/' + file_key
-                        
-                        log.info("Downloading: %s -> %s", full_remote_path, filename)
-                        # download_file expects: provider, local_directory, remote_full_path
-                        storage_service.download_file(out_provider, output_dir, full_remote_path)
-                        
-                        # Check if file was downloaded to a nested structure and move if needed
-                        for possible_subdir in ['out', os.path.dirname(file_key)]:
-                            if possible_subdir:
-                                nested_path = os.path.join(output_dir, possible_subdir, filename)
-                                final_path = os.path.join(output_dir, filename)
-                                if os.path.exists(nested_path) and nested_path != final_path:
-                                    log.debug("Moving %s -> %s", nested_path, final_path)
-                                    shutil.move(nested_path, final_path)
-                                    # Try to clean up empty directory
-                                    try:
-                                        os.rmdir(os.path.join(output_dir, possible_subdir))
-                                    except OSError:
-                                        pass
-                                    break
-            elif isinstance(files, list):
-                # Handle list of file objects
-                for file_info in files:
-                    if isinstance(file_info, dict) and 'Key' in file_info:
-                        file_key = file_info['Key']
-                        # Skip directory entries
-                        if file_key.endswith('/'):
-                            continue
-                            
-                        filename = os.path.basename(file_key)
-                        local_path = os.path.join(output_dir, filename)
-                        
-                        log.info("Downloading: %s -> %s", file_key, filename)
-                        # download_file expects: provider, local_directory, remote_full_path
-                        storage_service.download_file(out_provider, output_dir, file_key)
-                        
-                        # Check if file was downloaded to a nested structure
-                        nested_path = os.path.join(output_dir, file_key)
-                        if os.path.exists(nested_path) and nested_path != local_path:
-                            shutil.move(nested_path, local_path)
-                    elif isinstance(file_info, str):
-                        # Handle string file paths
-                        if file_info.endswith('/'):
-                            continue
-                            
-                        filename = os.path.basename(file_info)
-                        local_path = os.path.join(output_dir, filename)
-                        
-                        log.info("Downloading: %s -> %s", file_info, filename)
-                        # download_file expects: provider, local_directory, remote_full_path
-                        storage_service.download_file(out_provider, output_dir, file_info)
+            # Collect (remote path, subdirectories a nested copy may land in) before downloading
+            downloads = []
+            if isinstance(files, (dict, list)):
+                # S3-style responses report keys relative to the bucket root
+                relative_to_bucket = isinstance(files, dict)
+                for file_key in _iter_keys(files):  # e.g., "out/cwl_oscar_run_xxx.sh.exit_code"
+                    if not relative_to_bucket:
+                        downloads.append((file_key, [os.path.dirname(file_key)]))
+                        continue
+                    
+                    # Construct full download path
+                    # The file_key is relative to bucket root, but we need the full path
+                    # out_path is like "cwl-oscar/out", file_key is like "out/filename"
+                    # We need to combine them properly to get "cwl-oscar/out/filename"
+                    if file_key.startswith('out/'):
+                        # Remove 'out/' prefix and combine with service out path
+                        file_only = file_key[4:]  # Remove 'out/' prefix
+                        full_remote_path = out_path + '/' + file_only
+                    else:
+                        # Use as-is if it doesn't start with 'out/'
+                        full_remote_path = out_path + '/' + file_key
+                    
+                    downloads.append((full_remote_path, ['out', os.path.dirname(file_key)]))
             else:
                 log.warning("Unknown files list format: %s", type(files))
                 log.debug("Files content: %s", files)
+            
+            if downloads:
+                provider_client = self.get_provider_client(out_provider)
+                
+                def download(remote_path):
+                    log.info("Downloading: %s -> %s", remote_path, os.path.basename(remote_path))
+                    # download_file expects: local_directory, remote_full_path
+                    provider_client.download_file(output_dir, remote_path)
+                
+                with ThreadPoolExecutor(max_workers=min(MAX_TRANSFER_WORKERS, len(downloads))) as pool:
+                    list(pool.map(download, [remote_path for remote_path, _ in downloads]))
+                
+                # Flatten files that were downloaded to a nested structure, once all transfers are done
+                for remote_path, nested_dirs in downloads:
+                    filename = os.path.basename(remote_path)
+                    final_path = os.path.join(output_dir, filename)
+                    for possible_subdir in nested_dirs:
+                        if possible_subdir:
+                            nested_path = os.path.join(output_dir, possible_subdir, filename)
+                            if nested_path != final_path:
+                                # Both paths are below output_dir, so this is a rename
+                                try:
+                                    os.replace(nested_path, final_path)
+                                except FileNotFoundError:
+                                    continue
+                                log.debug("Moved %s -> %s", nested_path, final_path)
+                                # Try to clean up empty directory
+                                try:
+                                    os.rmdir(os.path.join(output_dir, possible_subdir))
+                                except OSError:
+                                    pass
+                                break
                         
         except Exception as e:
             log.error("Error downloading results: %s", e)
@@ -528,10 +829,11 @@ class OSCARLocalRunner:
             # Check if service already exists
             services_response = client.list_services()
             if services_response.status_code == 200:
-                existing_services = json.loads(services_response.text)
+                existing_services = json_loads(services_response.content)
                 for service in existing_services:
                     if service.get('name') == service_name:
                         log.info("Service '%s' already exists on cluster", service_name)
+                        self.update_service_secrets(service)
                         return True
             
             # Create service definition based on cwl-oscar.yaml template
@@ -543,6 +845,7 @@ class OSCARLocalRunner:
             
             if response.status_code in [200, 201]:
                 log.info("✅ Service '%s' created successfully", service_name)
+                self.refresh_services()
                 return True
             else:
                 log.error("❌ Failed to create service '%s': HTTP %d - %s", 
@@ -630,7 +933,8 @@ exit $exit_code
             'environment': {
                 'variables': {
                     'MOUNT_PATH': self.mount_path
-                }
+                },
+                'secrets': self._service_secrets()
             },
             'input': [{
                 'storage_provider': 'minio.default',
@@ -663,7 +967,9 @@ exit $exit_code
             # Update mount to use shared MinIO
             service_def["mount"]["storage_provider"] = "minio.shared"
         
-        log.debug("Created service definition: %s", json.dumps(service_def, indent=2))
+        if log.isEnabledFor(logging.DEBUG):
+            redacted = dict(service_def, environment=dict(service_def['environment'], secrets='***'))
+            log.debug("Created service definition: %s", json.dumps(redacted))
         return service_def
         
     def run_workflow(self, workflow_path, input_path, additional_files=None, 
@@ -694,13 +1000,23 @@ exit $exit_code
             
             # Step 2: Create and submit run script
             log.info("Step 2: Creating and submitting run script")
-            script_path = self.create_run_script(
+            # Both later steps work against the same service and storage
+            service_config = self.get_service_config(self.cwl_oscar_service)
+            storage_service = self.get_storage_service()
+            
+            # The run script reads the cluster secrets from the service environment
+            self.update_service_secrets(service_config)
+            with self.create_run_script(
                 uploaded_files['workflow'], 
                 uploaded_files['input'], 
-                additional_args
-            )
-            
-            success = self.submit_and_wait(script_path, timeout_seconds)
+                additional_args,
+                bundle_remote_path=uploaded_files.get('bundle')
+            ) as script_path:
+                success = self.submit_and_wait(
+                    script_path, timeout_seconds,
+                    service_config=service_config,
+                    storage_service=storage_service
+                )
             
             if not success:
                 log.error("Workflow execution failed or timed out")
@@ -708,7 +1024,12 @@ exit $exit_code
                 
             # Step 3: Download results
             log.info("Step 3: Downloading results")
-            results_dir = self.download_results(output_dir)
+            results_dir = self.download_results(
+                output_dir,
+                service_config=service_config,
+                storage_service=storage_service,
+                prefetched_listing=self._take_results_listing()
+            )
             
             log.info("Workflow execution completed successfully")
             log.info("Results available in: %s", results_dir)
@@ -718,11 +1039,6 @@ exit $exit_code
         except Exception as e:
             log.error("Workflow execution failed: %s", e)
             return False, None
-            
-        finally:
-            # Clean up temporary script
-            if 'script_path' in locals() and os.path.exists(script_path):
-                os.remove(script_path)
 
 
 def main():
@@ -752,6 +1068,10 @@ def main():
                         help="Disable SSL verification for corresponding cluster (can be specified multiple times)")
     parser.add_argument("--cluster-steps", type=str, action='append',
                         help="Comma-separated list of workflow steps to execute on corresponding cluster (can be specified multiple times)")
+    parser.add_argument("--cluster-weight", type=int, action='append',
+                        help="Relative share of unmapped steps scheduled on corresponding cluster, default 1 (can be specified multiple times)")
+    parser.add_argument("--cluster-scheduling", choices=SCHEDULING_POLICIES, default=SCHEDULING_ROUND_ROBIN,
+                        help="How steps without a --cluster-steps mapping are assigned to clusters (default: %(default)s)")
     
     # Shared MinIO bucket configuration for multi-cluster support
     parser.add_argument("--shared-minio-endpoint", type=str,
@@ -774,6 +1094,12 @@ def main():
     
     # Execution options
     parser.add_argument('--parallel', action='store_true', help='Enable parallel execution')
+    parser.add_argument('--max-parallel-tasks', type=int,
+                        help='Maximum number of OSCAR jobs in flight at once (default: 64)')
+    parser.add_argument('--oscar-cluster-cores', type=int,
+                        help='CPU cores available on the OSCAR side for parallel steps (default: 1024)')
+    parser.add_argument('--oscar-cluster-ram', type=int,
+                        help='RAM in GiB available on the OSCAR side for parallel steps (default: 8192)')
     parser.add_argument('--on-error', choices=['stop', 'continue'], default='stop',
                         help='Desired workflow behavior when a step fails')
     parser.add_argument('--compute-checksum', action='store_true', default=True,
@@ -782,6 +1108,23 @@ def main():
                         help='Do not compute checksum of contents while collecting outputs')
     parser.add_argument('--default-container', help='Specify a default docker container')
     parser.add_argument('--timestamps', action='store_true', help='Add timestamps to the errors, warnings, and notifications')
+    parser.add_argument('--lazy-images', choices=['none', 'soci', 'estargz', 'auto'], default='none',
+                        help="Create services with the SOCI or eStargz variant of their image listed in "
+                             "--lazy-image-index; 'auto' prefers SOCI (default: none)")
+    parser.add_argument('--lazy-image-index', default='~/.cwl-oscar/soci-index.yaml',
+                        help='Local YAML mapping of images to their soci/estargz variants, uploaded '
+                             'for the orchestrator when --lazy-images is used (default: ~/.cwl-oscar/soci-index.yaml)')
+    parser.add_argument('--service-prewarm', dest='prewarm_services', action='store_true', default=False,
+                        help="Create the OSCAR services of all tools before the workflow starts, so their images are "
+                             "pulled early. Steps without a --cluster-steps mapping get a service on every cluster")
+    parser.add_argument('--oscar-task-cache',
+                        help='Directory, as seen by the orchestrator (e.g. below --mount-path), of task results '
+                             'to reuse when a step runs again with the same tool, command, environment and input files')
+    parser.add_argument('--oscar-batch-size', type=int, default=None,
+                        help='Submit up to this many jobs of the same OSCAR service as one invocation '
+                             '(default: 1, which disables batching)')
+    parser.add_argument('--oscar-batch-window', type=float, default=None,
+                        help='Seconds a batch waits for more jobs before it is submitted (default: 0.05)')
     
     # Logging options
     logging_group = parser.add_mutually_exclusive_group()
@@ -817,6 +1160,13 @@ def main():
             if len(args.cluster_steps) != endpoint_count:
                 print("Error: Number of --cluster-steps arguments must match --cluster-endpoint arguments")
                 return 1
+        if args.cluster_weight:
+            if len(args.cluster_weight) != endpoint_count:
+                print("Error: Number of --cluster-weight arguments must match --cluster-endpoint arguments")
+                return 1
+            if any(weight < 1 for weight in args.cluster_weight):
+                print("Error: --cluster-weight values must be positive integers")
+                return 1
         
         # Build cluster configurations
         for i in range(endpoint_count):
@@ -826,7 +1176,8 @@ def main():
                 'username': args.cluster_username[i] if args.cluster_username else None,
                 'password': args.cluster_password[i] if args.cluster_password else None,
                 'ssl': not (args.cluster_disable_ssl and args.cluster_disable_ssl[i]),
-                'steps': [step.strip() for step in args.cluster_steps[i].split(',') if step.strip()] if args.cluster_steps else []
+                'steps': [step.strip() for step in args.cluster_steps[i].split(',') if step.strip()] if args.cluster_steps else [],
+                'weight': args.cluster_weight[i] if args.cluster_weight else 1
             }
             
             # Validate authentication for this cluster
@@ -913,6 +1264,14 @@ def main():
         additional_args.append('--debug')
     if args.parallel:
         additional_args.append('--parallel')
+    if args.max_parallel_tasks is not None:
+        additional_args.extend(['--max-parallel-tasks', str(args.max_parallel_tasks)])
+    if args.oscar_cluster_cores is not None:
+        additional_args.extend(['--oscar-cluster-cores', str(args.oscar_cluster_cores)])
+    if args.oscar_cluster_ram is not None:
+        additional_args.extend(['--oscar-cluster-ram', str(args.oscar_cluster_ram)])
+    if args.cluster_scheduling != SCHEDULING_ROUND_ROBIN:
+        additional_args.extend(['--cluster-scheduling', args.cluster_scheduling])
     if args.on_error != 'stop':
         additional_args.extend(['--on-error', args.on_error])
     if not args.compute_checksum:
@@ -921,6 +1280,26 @@ def main():
         additional_args.extend(['--default-container', args.default_container])
     if args.timestamps:
         additional_args.append('--timestamps')
+    if args.prewarm_services:
+        additional_args.append('--service-prewarm')
+    if args.oscar_task_cache:
+        additional_args.extend(['--oscar-task-cache', args.oscar_task_cache])
+    if args.oscar_batch_size is not None:
+        additional_args.extend(['--oscar-batch-size', str(args.oscar_batch_size)])
+    if args.oscar_batch_window is not None:
+        additional_args.extend(['--oscar-batch-window', str(args.oscar_batch_window)])
+    additional_files = list(args.additional_files or [])
+    if args.lazy_images != 'none':
+        additional_args.extend(['--lazy-images', args.lazy_images])
+        # The orchestrator looks images up in its own copy of the index, uploaded to the mount
+        lazy_image_index = os.path.expanduser(args.lazy_image_index)
+        if os.path.isfile(lazy_image_index):
+            additional_files.append(lazy_image_index)
+            additional_args.extend(['--lazy-image-index',
+                                    f"{args.mount_path}/{os.path.basename(lazy_image_index)}"])
+        else:
+            log.warning("Lazy image index %s not found; services will use their original images",
+                        lazy_image_index)
     
     # Create runner
     runner = OSCARLocalRunner(
@@ -948,7 +1327,7 @@ def main():
     success, results_dir = runner.run_workflow(
         workflow_path=args.workflow,
         input_path=args.input,
-        additional_files=args.additional_files,
+        additional_files=additional_files,
         additional_args=additional_args,
         output_dir=args.output_dir,
         timeout_seconds=args.timeout
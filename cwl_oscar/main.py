@@ -6,6 +6,7 @@ import os
 import functools
 import signal
 import sys
+import threading
 import logging
 from typing import MutableMapping, MutableSequence
 from typing_extensions import Text
@@ -15,25 +16,139 @@ from importlib.metadata import version, PackageNotFoundError
 import cwltool.main
 from cwltool.context import LoadingContext, RuntimeContext
 from cwltool.executors import (MultithreadedJobExecutor, SingleJobExecutor,
-                               JobExecutor)
-from cwltool.process import Process
+                               JobExecutor, TMPDIR_LOCK)
+from cwltool.command_line_tool import CommandLineTool
+from cwltool.errors import WorkflowException
+from cwltool.job import JobBase
+from cwltool.task_queue import TaskQueue
+from cwltool.process import Process, shortname
+from cwltool.workflow import Workflow
 
 from .oscar import make_oscar_tool, OSCARPathMapper
 from .cluster_manager import ClusterManager
+from .executor import SHUTDOWN_EVENT, JobBatcher
+from .task import drain_oscar_tasks
+from .constants import (DEFAULT_BATCH_MAX_JOBS, DEFAULT_BATCH_WINDOW, DEFAULT_CLUSTER_CORES, DEFAULT_CLUSTER_RAM,
+                        DEFAULT_LAZY_IMAGE_INDEX, DEFAULT_MAX_PARALLEL_TASKS, LAZY_IMAGE_NONE, LOCAL_JOB_WORKERS, LAZY_IMAGE_POLICIES, MAX_PARALLEL_TASKS_LIMIT,
+                        SCHEDULING_POLICIES, SCHEDULING_ROUND_ROBIN)
 from .__init__ import get_version_info
 
 log = logging.getLogger("oscar-backend")
 log.setLevel(logging.INFO)
-# Always use stderr for logging to keep stdout clean for JSON output
-console = logging.StreamHandler(sys.stderr)
-log.addHandler(console)
+# Always use stderr for logging to keep stdout clean for JSON output.
+# Install the handler only once so re-imports and repeated main() calls don't stack them.
+if not log.handlers:
+    log.addHandler(logging.StreamHandler(sys.stderr))
+console = log.handlers[0]
 
 DEFAULT_TMP_PREFIX = "tmp"
 DEFAULT_MOUNT_PATH = "/mnt/cwl-oscar/mount"
 
 
+class OSCARJobExecutor(MultithreadedJobExecutor):
+    """
+    Multithreaded executor with a local lane for in-process jobs.
+
+    Only command line jobs are sent to OSCAR and take one of the max_cores task
+    slots. ExpressionTool evaluations and workflow callback jobs are cheap and
+    local, so they run on a separate pool of LOCAL_JOB_WORKERS threads instead
+    of queueing behind remote tasks.
+
+    max_cores and max_ram describe the OSCAR cluster, so tools are admitted
+    against their ResourceRequirement rather than the local host. The number of
+    worker threads (and so of jobs in flight) is max_parallel_tasks.
+    """
+
+    def __init__(self, max_parallel_tasks=DEFAULT_MAX_PARALLEL_TASKS,
+                 cluster_cores=DEFAULT_CLUSTER_CORES, cluster_ram=DEFAULT_CLUSTER_RAM):
+        super().__init__()
+        self.max_parallel_tasks = max_parallel_tasks
+        self.max_cores = cluster_cores
+        self.max_ram = cluster_ram * 1024  # cwltool counts RAM in MiB
+
+    def run_job(self, job, runtime_context):
+        if job is not None and not isinstance(job, JobBase):
+            self.local_taskqueue.add(
+                functools.partial(self._runner, job, runtime_context, TMPDIR_LOCK),
+                runtime_context.workflow_eval_lock,
+            )
+            job = None
+        super().run_job(job, runtime_context)
+
+    def _in_flight(self):
+        return self.taskqueue.in_flight + self.local_taskqueue.in_flight
+
+    def run_jobs(self, process, job_order_object, logger, runtime_context):
+        # Same loop as MultithreadedJobExecutor.run_jobs, which sizes its pool by
+        # max_cores; here the pools are sized by the task slots and the local lane
+        self.taskqueue = TaskQueue(threading.Lock(), self.max_parallel_tasks)
+        self.local_taskqueue = TaskQueue(threading.Lock(), LOCAL_JOB_WORKERS)
+        try:
+            jobiter = process.job(job_order_object, self.output_callback, runtime_context)
+
+            if runtime_context.workflow_eval_lock is None:
+                raise WorkflowException("runtimeContext.workflow_eval_lock must not be None")
+
+            runtime_context.workflow_eval_lock.acquire()
+            for job in jobiter:
+                if job is not None and isinstance(job, JobBase):
+                    job.builder = runtime_context.builder or job.builder
+                    if job.outdir is not None:
+                        self.output_dirs.add(job.outdir)
+
+                self.run_job(job, runtime_context)
+
+                if job is None:
+                    if self._in_flight() > 0:
+                        self.wait_for_next_completion(runtime_context)
+                    else:
+                        logger.error("Workflow cannot make any more progress.")
+                        break
+
+            self.run_job(None, runtime_context)
+            while self._in_flight() > 0:
+                self.wait_for_next_completion(runtime_context)
+                self.run_job(None, runtime_context)
+
+            runtime_context.workflow_eval_lock.release()
+        finally:
+            for taskqueue in (self.taskqueue, self.local_taskqueue):
+                taskqueue.drain()
+                taskqueue.join()
+
+
+class OSCARToolFactory:
+    """construct_tool_object callable that builds tools with the OSCAR settings bound."""
+
+    __slots__ = ('cluster_manager', 'mount_path', 'service_name', 'shared_minio_config')
+
+    def __init__(self, cluster_manager, mount_path, service_name, shared_minio_config=None):
+        self.cluster_manager = cluster_manager
+        self.mount_path = mount_path
+        self.service_name = service_name
+        self.shared_minio_config = shared_minio_config
+
+    def __call__(self, toolpath_object, loading_context):
+        return make_oscar_tool(toolpath_object, loading_context, self.cluster_manager,
+                               self.mount_path, self.service_name, self.shared_minio_config)
+
+
+class OSCARPathMapperFactory:
+    """RuntimeContext.path_mapper callable that builds OSCARPathMappers for one mount path."""
+
+    __slots__ = ('mount_path',)
+
+    def __init__(self, mount_path):
+        self.mount_path = mount_path
+
+    def __call__(self, referenced_files, basedir, stagedir, separateDirs, **kwargs):
+        return OSCARPathMapper(referenced_files, basedir, stagedir, separateDirs,
+                               mount_path=self.mount_path, **kwargs)
+
+
+@functools.lru_cache(maxsize=None)
 def versionstring():
-    """Determine our version."""
+    """Determine our version (computed once, cwltool asks for it again at startup)."""
     try:
         cwltool_ver = version("cwltool")
     except PackageNotFoundError:
@@ -55,6 +170,12 @@ def main(args=None):
 
     parser = arg_parser()
     parsed_args = parser.parse_args(args)
+    if parsed_args.max_parallel_tasks < 1:
+        parser.error("--max-parallel-tasks must be a positive integer")
+    if parsed_args.oscar_cluster_cores < 1:
+        parser.error("--oscar-cluster-cores must be a positive integer")
+    if parsed_args.oscar_cluster_ram < 1:
+        parser.error("--oscar-cluster-ram must be a positive integer")
 
     # Log version information at startup
     log.info("Starting %s", versionstring())
@@ -64,7 +185,7 @@ def main(args=None):
         return 0
 
     # Initialize cluster manager
-    cluster_manager = ClusterManager()
+    cluster_manager = ClusterManager(scheduling_policy=parsed_args.cluster_scheduling)
     
     # Handle new multi-cluster arguments
     if parsed_args.cluster_endpoint:
@@ -91,7 +212,7 @@ def main(args=None):
             if arg == '--cluster-endpoint':
                 if current_cluster:
                     clusters.append(current_cluster)
-                current_cluster = {'endpoint': raw_args[i + 1], 'token': None, 'username': None, 'password': None, 'ssl': True, 'steps': []}
+                current_cluster = {'endpoint': raw_args[i + 1], 'token': None, 'username': None, 'password': None, 'ssl': True, 'steps': [], 'weight': 1}
                 i += 2
             elif arg == '--cluster-token':
                 if current_cluster:
@@ -141,6 +262,21 @@ def main(args=None):
                     parser.print_usage(sys.stderr)
                     print("cwl-oscar: error: --cluster-steps must follow --cluster-endpoint", file=sys.stderr)
                     return 1
+            elif arg == '--cluster-weight':
+                if current_cluster:
+                    weight_str = raw_args[i + 1]
+                    if not weight_str.isdigit() or int(weight_str) < 1:
+                        print(versionstring(), file=sys.stderr)
+                        parser.print_usage(sys.stderr)
+                        print(f"cwl-oscar: error: --cluster-weight must be a positive integer, got '{weight_str}'", file=sys.stderr)
+                        return 1
+                    current_cluster['weight'] = int(weight_str)
+                    i += 2
+                else:
+                    print(versionstring(), file=sys.stderr)
+                    parser.print_usage(sys.stderr)
+                    print("cwl-oscar: error: --cluster-weight must follow --cluster-endpoint", file=sys.stderr)
+                    return 1
             elif arg.startswith('--shared-minio') or arg.startswith('--mount-path') or arg.startswith('--outdir') or arg.startswith('--') or not arg.startswith('-'):
                 # Skip non-cluster arguments
                 i += 1
@@ -161,6 +297,7 @@ def main(args=None):
             password = cluster['password']
             ssl = cluster['ssl']
             steps = cluster['steps']
+            weight = cluster['weight']
             
             # Validate authentication for this cluster
             if not token and not username:
@@ -176,10 +313,11 @@ def main(args=None):
                 return 1
             
             # Add cluster to manager with steps
-            cluster_manager.add_cluster_from_args(endpoint, token, username, password, ssl, steps)
+            cluster_manager.add_cluster_from_args(endpoint, token, username, password, ssl, steps, weight)
             auth_method = "token" if token else "username/password"
             steps_info = f" (steps: {', '.join(steps)})" if steps else ""
-            log.info("Added cluster %d: %s (%s)%s", i+1, endpoint, auth_method, steps_info)
+            weight_info = f" (weight: {weight})" if weight != 1 else ""
+            log.info("Added cluster %d: %s (%s)%s%s", i+1, endpoint, auth_method, steps_info, weight_info)
     
     else:
         print(versionstring(), file=sys.stderr)
@@ -225,40 +363,49 @@ def main(args=None):
         log.info("Single cluster mode - using default cluster MinIO bucket")
 
     # Configure logging levels based on existing quiet/debug options
-    if hasattr(parsed_args, 'quiet') and parsed_args.quiet:
-        log.setLevel(logging.WARNING)
-    elif hasattr(parsed_args, 'debug') and parsed_args.debug:
-        log.setLevel(logging.DEBUG)
-    else:
-        log.setLevel(logging.INFO)
+    log.setLevel(logging.WARNING if parsed_args.quiet
+                 else logging.DEBUG if parsed_args.debug
+                 else logging.INFO)
 
     def signal_handler(*args):  # pylint: disable=unused-argument
         """setup signal handler"""
         log.info("received control-c signal")
-        log.info("terminating thread(s)...")
-        log.warning("remote OSCAR task(s) will keep running")
-        sys.exit(1)
+        SHUTDOWN_EVENT.set()
+        removed = drain_oscar_tasks(timeout=5)
+        log.info("removed %d remote OSCAR job(s), terminating thread(s)...", removed)
+        sys.exit(130)
     signal.signal(signal.SIGINT, signal_handler)
 
-    loading_context = cwltool.main.LoadingContext(vars(parsed_args))
-    loading_context.construct_tool_object = functools.partial(
-        make_oscar_tool, 
-        cluster_manager=cluster_manager,
-        mount_path=parsed_args.mount_path,
-        service_name=parsed_args.service_name,
-        shared_minio_config=shared_minio_config
+    # Both contexts only read the options they know, so they can share one mapping
+    context_args = vars(parsed_args)
+    loading_context = cwltool.main.LoadingContext(context_args)
+    loading_context.construct_tool_object = OSCARToolFactory(
+        cluster_manager,
+        parsed_args.mount_path,
+        parsed_args.service_name,
+        shared_minio_config
     )
     
-    runtime_context = cwltool.main.RuntimeContext(vars(parsed_args))
-    runtime_context.path_mapper = functools.partial(
-        OSCARPathMapper, mount_path=parsed_args.mount_path
-    )
+    runtime_context = cwltool.main.RuntimeContext(context_args)
+    runtime_context.path_mapper = OSCARPathMapperFactory(parsed_args.mount_path)
+    # Not a cwltool setting, so RuntimeContext drops it; OSCARTask reads it from here
+    runtime_context.oscar_task_cache = parsed_args.oscar_task_cache
+    runtime_context.oscar_lazy_images = parsed_args.lazy_images
+    runtime_context.oscar_lazy_image_index = parsed_args.lazy_image_index
+    runtime_context.oscar_job_batcher = JobBatcher(parsed_args.oscar_batch_size, parsed_args.oscar_batch_window)
     
-    job_executor = MultithreadedJobExecutor() if parsed_args.parallel \
-        else SingleJobExecutor()
-    # Set reasonable limits for cores and RAM
-    job_executor.max_ram = 8 * 1024 * 1024 * 1024  # 8GB in bytes
-    job_executor.max_cores = 4  # 4 CPU cores
+    # Jobs run remotely and only wait on OSCAR locally. Wider scatters queue for
+    # a free task slot instead of getting one thread each, and tool resource
+    # requests are checked against the cluster rather than this host.
+    if parsed_args.max_parallel_tasks > MAX_PARALLEL_TASKS_LIMIT:
+        log.warning("--max-parallel-tasks %d exceeds the limit of %d worker threads, using %d",
+                    parsed_args.max_parallel_tasks, MAX_PARALLEL_TASKS_LIMIT, MAX_PARALLEL_TASKS_LIMIT)
+        parsed_args.max_parallel_tasks = MAX_PARALLEL_TASKS_LIMIT
+    job_executor = OSCARJobExecutor(
+        max_parallel_tasks=parsed_args.max_parallel_tasks,
+        cluster_cores=parsed_args.oscar_cluster_cores,
+        cluster_ram=parsed_args.oscar_cluster_ram
+    ) if parsed_args.parallel else SingleJobExecutor()
     
     executor = functools.partial(
         oscar_execute, 
@@ -267,7 +414,8 @@ def main(args=None):
         cluster_manager=cluster_manager,
         mount_path=parsed_args.mount_path,
         service_name=parsed_args.service_name,
-        shared_minio_config=shared_minio_config
+        shared_minio_config=shared_minio_config,
+        prewarm_services=parsed_args.prewarm_services
     )
     
     # * Disable ANSI color codes in cwltool logging to fix log output
@@ -304,16 +452,62 @@ def oscar_execute(process,           # type: Process
                   mount_path,
                   service_name,
                   shared_minio_config,
-                  logger=log
+                  logger=log,
+                  prewarm_services=False
                   ):  # type: (...) -> Tuple[Optional[Dict[Text, Any]], Text]
     """Execute using OSCAR backend."""
     if not job_executor:
-        job_executor = MultithreadedJobExecutor()
+        job_executor = OSCARJobExecutor()
+    if prewarm_services:
+        prewarm_oscar_services(process, runtime_context, cluster_manager, mount_path, shared_minio_config)
     return job_executor(process, job_order, runtime_context, logger)
 
 
+def command_line_tool_steps(process):
+    """Yield (tool_spec, job_name) for every CommandLineTool a process runs, nested workflows included."""
+    if isinstance(process, CommandLineTool):
+        yield process.tool, shortname(process.tool.get("id", "job"))
+    elif isinstance(process, Workflow):
+        for step in process.steps:
+            if isinstance(step.embedded_tool, Workflow):
+                yield from command_line_tool_steps(step.embedded_tool)
+            elif isinstance(step.embedded_tool, CommandLineTool):
+                # cwltool names a step's jobs after the step, see WorkflowJobStep.job
+                yield step.embedded_tool.tool, shortname(step.id)
+
+
+def prewarm_oscar_services(process, runtime_context, cluster_manager, mount_path, shared_minio_config):
+    """
+    Create the OSCAR services of every tool in the workflow before the first job runs.
+    
+    Services are otherwise created by the first job of each tool, which then also
+    waits for its image to be pulled. Each step is prepared on the cluster it is
+    mapped to, or on every cluster it could be scheduled on.
+    """
+    steps_by_cluster = {}
+    for tool_spec, job_name in command_line_tool_steps(process):
+        for cluster in cluster_manager.candidate_clusters_for_step(job_name):
+            steps_by_cluster.setdefault(cluster.name, (cluster, []))[1].append((tool_spec, job_name))
+    
+    for cluster, tool_steps in steps_by_cluster.values():
+        service_manager = cluster_manager.get_service_manager(
+            cluster,
+            mount_path,
+            shared_minio_config,
+            lazy_image_policy=getattr(runtime_context, 'oscar_lazy_images', LAZY_IMAGE_NONE),
+            lazy_image_index=getattr(runtime_context, 'oscar_lazy_image_index', DEFAULT_LAZY_IMAGE_INDEX)
+        )
+        service_manager.prewarm(tool_steps)
+
+
+@functools.lru_cache(maxsize=None)
 def arg_parser():  # type: () -> argparse.ArgumentParser
-    """Create argument parser for cwl-oscar."""
+    """
+    Create argument parser for cwl-oscar.
+
+    The parser is built on first use and shared by later calls (e.g. repeated
+    main() invocations when used as a library), so callers must not modify it.
+    """
     parser = argparse.ArgumentParser(
         description='OSCAR executor for Common Workflow Language.')
     
@@ -330,6 +524,12 @@ def arg_parser():  # type: () -> argparse.ArgumentParser
                         help="Disable SSL verification for corresponding cluster (can be specified multiple times)")
     parser.add_argument("--cluster-steps", type=str, action='append',
                         help="Comma-separated list of workflow steps to execute on corresponding cluster (can be specified multiple times)")
+    parser.add_argument("--cluster-weight", type=int, action='append',
+                        help="Relative share of unmapped steps scheduled on corresponding cluster, default 1 (can be specified multiple times)")
+    parser.add_argument("--cluster-scheduling", choices=SCHEDULING_POLICIES,
+                        default=SCHEDULING_ROUND_ROBIN,
+                        help="How steps without a --cluster-steps mapping are assigned to clusters "
+                        "(default: %(default)s)")
     
     # Shared MinIO bucket configuration for multi-cluster support
     parser.add_argument("--shared-minio-endpoint", type=str,
@@ -349,6 +549,23 @@ def arg_parser():  # type: () -> argparse.ArgumentParser
     parser.add_argument("--service-name", type=str,
                         default="run-script-event2",
                         help="OSCAR service name to use for execution")
+    parser.add_argument("--lazy-images", choices=LAZY_IMAGE_POLICIES, default=LAZY_IMAGE_NONE,
+                        help="Create services with the SOCI or eStargz variant of their image listed in "
+                             "--lazy-image-index; 'auto' prefers SOCI (default: %(default)s)")
+    parser.add_argument("--lazy-image-index", type=str, default=DEFAULT_LAZY_IMAGE_INDEX,
+                        help="YAML mapping of images to their 'soci' and 'estargz' variants "
+                             "(default: %(default)s)")
+    parser.add_argument("--service-prewarm", dest="prewarm_services", action="store_true", default=False,
+                        help="Create the OSCAR services of all tools before the workflow starts, so their images are "
+                             "pulled early. Steps without a --cluster-steps mapping get a service on every cluster")
+    parser.add_argument("--oscar-task-cache", type=str, default=None,
+                        help="Directory of OSCAR task results to reuse when a step runs again "
+                             "with the same tool, command, environment and input files")
+    parser.add_argument("--oscar-batch-size", type=int, default=DEFAULT_BATCH_MAX_JOBS,
+                        help="Submit up to this many jobs of the same OSCAR service as one invocation "
+                             "(default: %(default)s, which disables batching)")
+    parser.add_argument("--oscar-batch-window", type=float, default=DEFAULT_BATCH_WINDOW,
+                        help="Seconds a batch waits for more jobs before it is submitted (default: %(default)s)")
     
     # Standard cwltool arguments
     parser.add_argument("--basedir", type=Text)
@@ -501,6 +718,18 @@ def arg_parser():  # type: () -> argparse.ArgumentParser
     exgroup.add_argument(
         "--serial", action="store_false", dest="parallel",
         help="Run jobs serially")
+    parser.add_argument(
+        "--max-parallel-tasks", type=int, default=DEFAULT_MAX_PARALLEL_TASKS,
+        help="Maximum number of OSCAR jobs in flight at once when running in "
+        "parallel (default: %(default)s)")
+    parser.add_argument(
+        "--oscar-cluster-cores", type=int, default=DEFAULT_CLUSTER_CORES,
+        help="CPU cores available on the OSCAR side; parallel steps are scheduled "
+        "against this and their ResourceRequirement (default: %(default)s)")
+    parser.add_argument(
+        "--oscar-cluster-ram", type=int, default=DEFAULT_CLUSTER_RAM,
+        help="RAM in GiB available on the OSCAR side; parallel steps are scheduled "
+        "against this and their ResourceRequirement (default: %(default)s)")
 
     parser.add_argument(
         "--version",
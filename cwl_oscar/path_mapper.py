@@ -34,28 +34,26 @@ class OSCARPathMapper(PathMapper):
     def __init__(self, referenced_files, basedir, stagedir, separateDirs, mount_path=None, **kwargs):
         # Extract mount_path from kwargs if provided, or use default
         self.mount_path = mount_path or DEFAULT_MOUNT_PATH
+        self._mount_prefix = self.mount_path.rstrip('/') + '/'
         super(OSCARPathMapper, self).__init__(referenced_files, basedir, stagedir, separateDirs, **kwargs)
         
-    def setup(self, referenced_files, basedir):
-        """Set up path mappings for OSCAR execution."""
-        # Call parent setup first to handle the standard path mapping
-        super(OSCARPathMapper, self).setup(referenced_files, basedir)
+    def visit(self, obj, stagedir, basedir, copy=False, staged=False):
+        """Map a File or Directory, using files already in the mount path in place."""
+        location = obj["location"]
+        if location in self._pathmap:
+            return
+        # The parent walks listings and secondaryFiles back through this method,
+        # so each entry is mapped for OSCAR as it is added, in a single pass
+        super(OSCARPathMapper, self).visit(obj, stagedir, basedir, copy=copy, staged=staged)
         
-        # Apply OSCAR-specific path mappings
-        # For files already in mount path, use direct mount path access instead of staging
-        for key in list(self._pathmap.keys()):
-            entry = self._pathmap[key]
-            if hasattr(entry, 'resolved') and entry.resolved:
-                resolved_path = entry.resolved
-                
-                # If file is already in the mount path, use it directly without staging
-                if self.mount_path in resolved_path:
-                    log.debug("File already in mount path, using direct access: %s", resolved_path)
-                    # Use the mount path directly - no staging needed
-                    self._pathmap[key] = MapperEnt(
-                        resolved=resolved_path,
-                        target=resolved_path,  # Use same path as target
-                        type=entry.type,
-                        staged=False  # Don't stage - file is already accessible
-                    )
-                    log.debug("Direct mount path mapping: %s -> %s", resolved_path, resolved_path)
+        entry = self._pathmap[location]
+        resolved_path = entry.resolved
+        # If file is already in the mount path, use it directly without staging
+        if resolved_path and (resolved_path.startswith(self._mount_prefix) or resolved_path == self.mount_path):
+            log.debug("File already in mount path, using direct access: %s", resolved_path)
+            self._pathmap[location] = MapperEnt(
+                resolved=resolved_path,
+                target=resolved_path,  # Use same path as target
+                type=entry.type,
+                staged=False  # Don't stage - file is already accessible
+            )
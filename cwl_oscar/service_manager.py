@@ -15,30 +15,158 @@
 
 """OSCAR Service Manager for dynamic service creation."""
 
+import functools
 import hashlib
 import json
 import logging
-import re
+import os
+import tempfile
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 
+import requests
+import yaml
+
 try:
     from constants import *
     from scripts.oscar_service_script import OSCAR_SERVICE_SCRIPT_TEMPLATE
-    from utils import create_oscar_client, sanitize_service_name
+    from utils import create_oscar_client, sanitize_service_name, base_step_name, get_provider_client, json_loads
 except ImportError:
     # Fallback for package import
     from .constants import *
     from .scripts.oscar_service_script import OSCAR_SERVICE_SCRIPT_TEMPLATE
-    from .utils import create_oscar_client, sanitize_service_name
+    from .utils import create_oscar_client, sanitize_service_name, base_step_name, get_provider_client, json_loads
 
 log = logging.getLogger("oscar-backend")
 
 
+def _service_hash(content):
+    """
+    Return the SERVICE_HASH_LENGTH fingerprint used in generated service names.
+    
+    MD5 is only a content fingerprint here; changing the digest would rename, and so
+    recreate, every service created by earlier releases.
+    """
+    return hashlib.md5(content, usedforsecurity=False).hexdigest()[:SERVICE_HASH_LENGTH]
+
+
+@functools.lru_cache(maxsize=None)
+def _load_lazy_image_index(path):
+    """
+    Load the mapping of image references to their lazy-pull variants.
+    
+    The file maps each image to the variants available for it, e.g.
+    ``python:3.12: {soci: registry/python:3.12-soci, estargz: registry/python:3.12-esgz}``.
+    A missing or unreadable file means no variants are known.
+    """
+    try:
+        with open(os.path.expanduser(path), 'r') as f:
+            index = yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, yaml.YAMLError) as e:
+        log.warning("%s: Could not read lazy image index %s: %s", LOG_PREFIX_SERVICE_MANAGER, path, e)
+        return {}
+    if not isinstance(index, dict):
+        log.warning("%s: Ignoring lazy image index %s, expected a mapping", LOG_PREFIX_SERVICE_MANAGER, path)
+        return {}
+    return index
+
+
+# Services verified on each cluster (endpoint -> {service name: verification time}),
+# persisted in SERVICE_CACHE_FILE so later runs can skip checking them again
+_KNOWN_SERVICES = None
+_KNOWN_SERVICES_LOCK = threading.Lock()
+
+
+def _load_known_services():
+    """Return the persistent service cache, reading SERVICE_CACHE_FILE on first use."""
+    global _KNOWN_SERVICES
+    with _KNOWN_SERVICES_LOCK:
+        if _KNOWN_SERVICES is None:
+            try:
+                with open(os.path.expanduser(SERVICE_CACHE_FILE), 'r') as f:
+                    _KNOWN_SERVICES = json.load(f)
+            except (OSError, ValueError):
+                _KNOWN_SERVICES = {}
+            if not isinstance(_KNOWN_SERVICES, dict):
+                _KNOWN_SERVICES = {}
+        return _KNOWN_SERVICES
+
+
+def _save_known_services(known_services):
+    """Write the service cache file atomically; the caller holds _KNOWN_SERVICES_LOCK."""
+    cache_path = os.path.expanduser(SERVICE_CACHE_FILE)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(known_services, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        log.debug("%s: Could not write service cache %s: %s", LOG_PREFIX_SERVICE_MANAGER, cache_path, e)
+
+
+def _record_known_service(endpoint, service_name):
+    """
+    Mark a service as verified now and write the cache file atomically.
+    
+    The verification time only matters for SERVICE_CACHE_TTL, so a service
+    recorded less than half a TTL ago is left as is and the file is not rewritten.
+    """
+    known_services = _load_known_services()
+    now = time.time()
+    with _KNOWN_SERVICES_LOCK:
+        services = known_services.setdefault(endpoint, {})
+        verified_at = services.get(service_name)
+        if verified_at is not None and now - verified_at < SERVICE_CACHE_TTL / 2:
+            return
+        services[service_name] = now
+        _save_known_services(known_services)
+
+
+def _forget_known_service(endpoint, service_name):
+    """Drop a service that no longer exists from the cache file."""
+    known_services = _load_known_services()
+    with _KNOWN_SERVICES_LOCK:
+        if known_services.get(endpoint, {}).pop(service_name, None) is not None:
+            _save_known_services(known_services)
+
+
+# Requirements and service names per tool spec, shared by the per-task service managers
+TOOL_SERVICE_CACHE_SIZE = 256
+_TOOL_SERVICE_CACHE = {}
+
+# Warm-up invocations cost a job per new service, so they only run when asked for
+SERVICE_WARMUP_ENABLED = os.environ.get('CWL_OSCAR_WARMUP', str(int(ENABLE_SERVICE_WARMUP))).lower() in ('1', 'true', 'yes')
+
+# Service creations run on a pool shared by all service managers (CWL_OSCAR_POOL threads)
+SERVICE_POOL_WORKERS = int(os.environ.get('CWL_OSCAR_POOL', SERVICE_PREWARM_WORKERS))
+_SERVICE_POOL = None
+_SERVICE_POOL_LOCK = threading.Lock()
+
+
+def _service_pool():
+    """Return the shared service creation pool, starting it on first use."""
+    global _SERVICE_POOL
+    with _SERVICE_POOL_LOCK:
+        if _SERVICE_POOL is None:
+            _SERVICE_POOL = ThreadPoolExecutor(max_workers=SERVICE_POOL_WORKERS, thread_name_prefix='oscar-svc')
+        return _SERVICE_POOL
+
+
+# Service definitions without their per-service fields, by requirements and storage setup
+_SERVICE_DEF_TEMPLATES = {}
+
+
 class OSCARServiceManager:
     """Manages dynamic OSCAR service creation based on CommandLineTool requirements."""
     
-    def __init__(self, oscar_endpoint, oscar_token, oscar_username, oscar_password, mount_path, ssl=True, shared_minio_config=None):
+    def __init__(self, oscar_endpoint, oscar_token, oscar_username, oscar_password, mount_path, ssl=True, shared_minio_config=None, client=None,
+                 lazy_image_policy=LAZY_IMAGE_NONE, lazy_image_index=DEFAULT_LAZY_IMAGE_INDEX):
         log.debug("%s: Initializing service manager", LOG_PREFIX_SERVICE_MANAGER)
         log.debug("%s: OSCAR endpoint: %s", LOG_PREFIX_SERVICE_MANAGER, oscar_endpoint)
         log.debug("%s: Mount path: %s", LOG_PREFIX_SERVICE_MANAGER, mount_path)
@@ -51,9 +179,20 @@ class OSCARServiceManager:
         self.oscar_password = oscar_password
         self.mount_path = mount_path
         self.ssl = ssl
-        self.client = None
-        self._service_cache = {}  # Cache created services
+        self.client = client
+        # Cache created services, starting with those verified recently by this or an earlier run
+        verified_since = time.time() - SERVICE_CACHE_TTL
+        self._service_cache = {
+            name: verified_at
+            for name, verified_at in _load_known_services().get(oscar_endpoint, {}).items()
+            if verified_at >= verified_since
+        }
+        self._cluster_services = None  # Services on the cluster by name, see _get_cluster_services_index
+        self._cluster_services_ts = 0.0
+        self._lock = threading.RLock()  # Guards the two caches above
         self.shared_minio_config = shared_minio_config
+        self.lazy_image_policy = lazy_image_policy
+        self.lazy_image_index = lazy_image_index
         
         log.debug("%s: Service manager initialized successfully", LOG_PREFIX_SERVICE_MANAGER)
         
@@ -73,74 +212,52 @@ class OSCARServiceManager:
             
         return self.client
         
-    def _extract_docker_requirements(self, tool_spec, requirements):
-        """Extract Docker requirements from tool specification."""
-        if 'requirements' in tool_spec:
-            for req in tool_spec['requirements']:
-                if req.get('class') == 'DockerRequirement' and 'dockerPull' in req:
-                    old_image = requirements['image']
-                    requirements['image'] = req['dockerPull']
-                    log.debug("%s: Updated Docker image from '%s' to '%s'", 
-                             LOG_PREFIX_SERVICE_MANAGER, old_image, requirements['image'])
-        
-        # Check hints as well
-        if 'hints' in tool_spec:
-            for hint in tool_spec['hints']:
-                if hint.get('class') == 'DockerRequirement' and 'dockerPull' in hint:
-                    old_image = requirements['image']
-                    requirements['image'] = hint['dockerPull']
-                    log.debug("%s: Updated Docker image from hint: '%s' to '%s'", 
-                             LOG_PREFIX_SERVICE_MANAGER, old_image, requirements['image'])
+    def _apply_docker_requirement(self, req, requirements, source="requirement"):
+        """Apply a DockerRequirement (or hint) to the service requirements."""
+        if 'dockerPull' in req:
+            old_image = requirements['image']
+            requirements['image'] = req['dockerPull']
+            log.debug("%s: Updated Docker image from %s: '%s' to '%s'", 
+                     LOG_PREFIX_SERVICE_MANAGER, source, old_image, requirements['image'])
     
-    def _extract_resource_requirements(self, tool_spec, requirements):
-        """Extract resource requirements from tool specification."""
-        if 'requirements' in tool_spec:
-            for req in tool_spec['requirements']:
-                if req.get('class') == 'ResourceRequirement':
-                    if 'ramMin' in req:
-                        ram_mb = req['ramMin']
-                        old_memory = requirements['memory']
-                        requirements['memory'] = f"{ram_mb}Mi"
-                        log.debug("%s: Updated memory from '%s' to '%s'", 
-                                 LOG_PREFIX_SERVICE_MANAGER, old_memory, requirements['memory'])
-                    if 'coresMin' in req:
-                        old_cpu = requirements['cpu']
-                        requirements['cpu'] = str(req['coresMin'])
-                        log.debug("%s: Updated CPU from '%s' to '%s'", 
-                                 LOG_PREFIX_SERVICE_MANAGER, old_cpu, requirements['cpu'])
+    def _apply_resource_requirement(self, req, requirements):
+        """Apply a ResourceRequirement to the service requirements."""
+        if 'ramMin' in req:
+            ram_mb = req['ramMin']
+            old_memory = requirements['memory']
+            requirements['memory'] = f"{ram_mb}Mi"
+            log.debug("%s: Updated memory from '%s' to '%s'", 
+                     LOG_PREFIX_SERVICE_MANAGER, old_memory, requirements['memory'])
+        if 'coresMin' in req:
+            old_cpu = requirements['cpu']
+            requirements['cpu'] = str(req['coresMin'])
+            log.debug("%s: Updated CPU from '%s' to '%s'", 
+                     LOG_PREFIX_SERVICE_MANAGER, old_cpu, requirements['cpu'])
     
-    def _extract_environment_requirements(self, tool_spec, requirements):
-        """Extract environment variable requirements from tool specification."""
-        if 'requirements' in tool_spec:
-            for req in tool_spec['requirements']:
-                if req.get('class') == 'EnvVarRequirement' and 'envDef' in req:
-                    # envDef is a dictionary in CWL spec
-                    if isinstance(req['envDef'], dict):
-                        log.debug("%s: Adding %d environment variables", 
-                                 LOG_PREFIX_SERVICE_MANAGER, len(req['envDef']))
-                        requirements['environment'].update(req['envDef'])
-                    else:
-                        # Handle legacy format if it's a list
-                        log.debug("%s: Processing legacy envDef list format", LOG_PREFIX_SERVICE_MANAGER)
-                        for env_def in req['envDef']:
-                            if isinstance(env_def, dict):
-                                requirements['environment'][env_def['envName']] = env_def['envValue']
-                                log.debug("%s: Added env var: %s=%s", 
-                                         LOG_PREFIX_SERVICE_MANAGER, env_def['envName'], env_def['envValue'])
-        
-        # Also check hints for environment variables
-        if 'hints' in tool_spec:
-            for hint in tool_spec['hints']:
-                if hint.get('class') == 'EnvVarRequirement' and 'envDef' in hint:
-                    env_def = hint.get('envDef', {})
-                    for var_name, var_value in env_def.items():
-                        requirements['environment'][var_name] = var_value
+    def _apply_environment_requirement(self, req, requirements):
+        """Apply an EnvVarRequirement to the service requirements."""
+        if 'envDef' not in req:
+            return
+        # envDef is a dictionary in CWL spec
+        if isinstance(req['envDef'], dict):
+            log.debug("%s: Adding %d environment variables", 
+                     LOG_PREFIX_SERVICE_MANAGER, len(req['envDef']))
+            requirements['environment'].update(req['envDef'])
+        else:
+            # Handle legacy format if it's a list
+            log.debug("%s: Processing legacy envDef list format", LOG_PREFIX_SERVICE_MANAGER)
+            for env_def in req['envDef']:
+                if isinstance(env_def, dict):
+                    requirements['environment'][env_def['envName']] = env_def['envValue']
+                    log.debug("%s: Added env var: %s=%s", 
+                             LOG_PREFIX_SERVICE_MANAGER, env_def['envName'], env_def['envValue'])
         
     def extract_service_requirements(self, tool_spec):
         """Extract service requirements from CommandLineTool specification."""
-        log.debug("%s: Extracting service requirements from tool spec", LOG_PREFIX_SERVICE_MANAGER)
-        log.debug("%s: Tool ID: %s", LOG_PREFIX_SERVICE_MANAGER, tool_spec.get('id', 'unknown'))
-        log.debug("%s: Tool baseCommand: %s", LOG_PREFIX_SERVICE_MANAGER, tool_spec.get('baseCommand', 'unknown'))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s: Extracting service requirements from tool spec", LOG_PREFIX_SERVICE_MANAGER)
+            log.debug("%s: Tool ID: %s", LOG_PREFIX_SERVICE_MANAGER, tool_spec.get('id', 'unknown'))
+            log.debug("%s: Tool baseCommand: %s", LOG_PREFIX_SERVICE_MANAGER, tool_spec.get('baseCommand', 'unknown'))
         
         requirements = {
             'memory': DEFAULT_MEMORY,
@@ -150,13 +267,47 @@ class OSCARServiceManager:
         }
         log.debug("%s: Default requirements: %s", LOG_PREFIX_SERVICE_MANAGER, requirements)
         
-        # Extract different types of requirements
-        self._extract_docker_requirements(tool_spec, requirements)
-        self._extract_resource_requirements(tool_spec, requirements)
-        self._extract_environment_requirements(tool_spec, requirements)
+        # A single pass over requirements followed by hints, so hints take precedence
+        # for the image and environment; resources come from requirements only
+        for section, is_hint in ((tool_spec.get('requirements', ()), False),
+                                 (tool_spec.get('hints', ()), True)):
+            for req in section:
+                cls = req.get('class')
+                if cls == 'DockerRequirement':
+                    self._apply_docker_requirement(req, requirements, "hint" if is_hint else "requirement")
+                elif cls == 'ResourceRequirement' and not is_hint:
+                    self._apply_resource_requirement(req, requirements)
+                elif cls == 'EnvVarRequirement':
+                    self._apply_environment_requirement(req, requirements)
         
         log.debug("%s: Final extracted requirements: %s", LOG_PREFIX_SERVICE_MANAGER, requirements)
         return requirements
+    
+    def _resolve_service(self, tool_spec, job_name):
+        """
+        Return the (requirements, service_name) for a tool, memoized per tool spec.
+        
+        Every job of a CommandLineTool shares the same tool_spec object, so the
+        requirement walk and the service-name hash only run for its first job.
+        """
+        tool_id = base_step_name(job_name) if job_name else None
+        minio_endpoint = self.shared_minio_config.get('endpoint') if self.shared_minio_config else None
+        name_key = (tool_id, self.mount_path, minio_endpoint, self.lazy_image_policy)
+        
+        entry = _TOOL_SERVICE_CACHE.get(id(tool_spec))
+        if entry is None or entry[0] is not tool_spec:
+            # The spec is kept in the entry so its id() cannot be reused by another object
+            entry = (tool_spec, self.extract_service_requirements(tool_spec), {})
+            if len(_TOOL_SERVICE_CACHE) >= TOOL_SERVICE_CACHE_SIZE:
+                _TOOL_SERVICE_CACHE.pop(next(iter(_TOOL_SERVICE_CACHE)), None)
+            _TOOL_SERVICE_CACHE[id(tool_spec)] = entry
+        
+        _, requirements, service_names = entry
+        service_name = service_names.get(name_key)
+        if service_name is None:
+            service_name = self.generate_service_name(tool_spec, requirements, job_name)
+            service_names[name_key] = service_name
+        return requirements, service_name
         
     def generate_service_name(self, tool_spec, requirements, job_name=None):
         """Generate a unique service name based on tool and requirements."""
@@ -165,8 +316,7 @@ class OSCARServiceManager:
         # Extract base step name by removing CWL scatter suffixes (_2, _3, etc.)
         if job_name:
             # Remove CWL scatter suffixes like _2, _3, etc. to enable service reuse
-            base_step_name = re.sub(r'_\d+$', '', job_name)
-            tool_id = base_step_name
+            tool_id = base_step_name(job_name)
             log.debug("%s: Using base step name as tool ID: '%s' (from job_name: '%s')", LOG_PREFIX_SERVICE_MANAGER, tool_id, job_name)
         else:
             tool_id = "tool"
@@ -187,10 +337,14 @@ class OSCARServiceManager:
             log.debug("%s: Including MinIO endpoint in hash: %s", 
                      LOG_PREFIX_SERVICE_MANAGER, self.shared_minio_config.get('endpoint'))
         
-        tool_content = json.dumps(hash_content, sort_keys=True)
+        # Services with lazy-pull images must not be reused by runs that don't want them (or vice versa)
+        if self.lazy_image_policy != LAZY_IMAGE_NONE:
+            hash_content['lazy_image_policy'] = self.lazy_image_policy
+        
+        tool_content = json.dumps(hash_content, sort_keys=True).encode()
         log.debug("%s: Tool content for hashing: %s", LOG_PREFIX_SERVICE_MANAGER, tool_content)
         
-        service_hash = hashlib.md5(tool_content.encode()).hexdigest()[:SERVICE_HASH_LENGTH]
+        service_hash = _service_hash(tool_content)
         log.debug("%s: Generated service hash: %s", LOG_PREFIX_SERVICE_MANAGER, service_hash)
         
         # Use tool_id directly without cleaning
@@ -205,9 +359,63 @@ class OSCARServiceManager:
         log.debug("%s: Final generated service name: '%s'", LOG_PREFIX_SERVICE_MANAGER, final_service_name)
         return final_service_name
         
+    def _maybe_rewrite_image(self, image):
+        """
+        Return (image, snapshotter) for the service, using a lazy-pull variant when one is known.
+        
+        Variants come from the lazy image index file; with the 'auto' policy SOCI is
+        preferred over eStargz. snapshotter is None when the image is left as is.
+        """
+        if self.lazy_image_policy == LAZY_IMAGE_NONE:
+            return image, None
+        variants = _load_lazy_image_index(self.lazy_image_index).get(image)
+        if not isinstance(variants, dict):
+            return image, None
+        
+        formats = LAZY_IMAGE_FORMATS if self.lazy_image_policy == LAZY_IMAGE_AUTO else (self.lazy_image_policy,)
+        for image_format in formats:
+            if variants.get(image_format):
+                log.info("%s: Using %s image %s for %s", LOG_PREFIX_SERVICE_MANAGER,
+                         image_format, variants[image_format], image)
+                return variants[image_format], LAZY_IMAGE_SNAPSHOTTERS[image_format]
+        return image, None
+        
     def create_service_definition(self, service_name, requirements, mount_path, shared_minio_config=None):
         """Create OSCAR service definition."""
         log.debug("%s: Creating service definition for service: %s", LOG_PREFIX_SERVICE_MANAGER, service_name)
+        
+        # Tools with the same requirements only differ in the name and the input/output buckets
+        template_key = (
+            requirements['image'], requirements['memory'], requirements['cpu'],
+            tuple(sorted(requirements['environment'].items())), mount_path,
+            tuple(sorted(shared_minio_config.items())) if shared_minio_config else None,
+            self.lazy_image_policy, self.lazy_image_index,
+        )
+        template = _SERVICE_DEF_TEMPLATES.get(template_key)
+        if template is None:
+            template = self._build_service_template(requirements, mount_path, shared_minio_config)
+            _SERVICE_DEF_TEMPLATES[template_key] = template
+        
+        # Shallow copy: the nested parts of the template are shared, never modified
+        service_def = {
+            'name': service_name,
+            **template,
+            'input': [{
+                'storage_provider': DEFAULT_STORAGE_PROVIDER,
+                'path': f'{service_name}/in'
+            }],
+            'output': [{
+                'storage_provider': DEFAULT_STORAGE_PROVIDER, 
+                'path': f'{service_name}/out'
+            }],
+        }
+        
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s: Created service definition: %s", LOG_PREFIX_SERVICE_MANAGER, json.dumps(service_def))
+        return service_def
+    
+    def _build_service_template(self, requirements, mount_path, shared_minio_config=None):
+        """Build the parts of a service definition that don't depend on the service name."""
         log.debug("%s: Requirements: %s", LOG_PREFIX_SERVICE_MANAGER, requirements)
         log.debug("%s: Mount path: %s", LOG_PREFIX_SERVICE_MANAGER, mount_path)
         
@@ -225,11 +433,12 @@ class OSCARServiceManager:
         
         log.debug("%s: Using script template (%d characters)", LOG_PREFIX_SERVICE_MANAGER, len(OSCAR_SERVICE_SCRIPT_TEMPLATE))
         
-        service_def = {
-            'name': service_name,
+        image, snapshotter = self._maybe_rewrite_image(requirements['image'])
+        
+        template = {
             'memory': requirements['memory'],
             'cpu': requirements['cpu'],
-            'image': requirements['image'],
+            'image': image,
             'script': OSCAR_SERVICE_SCRIPT_TEMPLATE,
             'environment': {
                 'variables': {
@@ -237,23 +446,19 @@ class OSCARServiceManager:
                     **requirements['environment']
                 }
             },
-            'input': [{
-                'storage_provider': DEFAULT_STORAGE_PROVIDER,
-                'path': f'{service_name}/in'
-            }],
-            'output': [{
-                'storage_provider': DEFAULT_STORAGE_PROVIDER, 
-                'path': f'{service_name}/out'
-            }],
             'mount': {
                 'storage_provider': DEFAULT_STORAGE_PROVIDER,
                 'path': f'/{mount_base}'
             }
         }
         
+        # Let clusters with the matching containerd snapshotter pull the image lazily
+        if snapshotter:
+            template['annotations'] = {'containerd.io/snapshotter': snapshotter}
+        
         # Add storage_providers if shared MinIO is configured
         if shared_minio_config:
-            service_def["storage_providers"] = {
+            template["storage_providers"] = {
                 "minio": {
                     "shared": {
                         "endpoint": shared_minio_config["endpoint"],
@@ -266,43 +471,97 @@ class OSCARServiceManager:
             }
             
             # Update only mount to use shared MinIO, keep input/output as minio.default
-            service_def["mount"]["storage_provider"] = SHARED_STORAGE_PROVIDER
+            template["mount"]["storage_provider"] = SHARED_STORAGE_PROVIDER
         
-        log.debug("%s: Created service definition: %s", LOG_PREFIX_SERVICE_MANAGER, json.dumps(service_def, indent=2))
-        return service_def
+        return template
         
+    def _cache_service(self, name, service):
+        """Remember that a service exists, for this manager and for later runs."""
+        with self._lock:
+            self._service_cache[name] = service
+        _record_known_service(self.oscar_endpoint, name)
+    
+    def forget_service(self, name):
+        """Forget a cached service that turned out to be missing from the cluster."""
+        log.info("%s: Service '%s' no longer exists on the cluster, dropping it from the cache",
+                 LOG_PREFIX_SERVICE_MANAGER, name)
+        with self._lock:
+            self._service_cache.pop(name, None)
+            if self._cluster_services is not None:
+                self._cluster_services.pop(name, None)
+        _forget_known_service(self.oscar_endpoint, name)
+    
     def _check_service_exists(self, client, name):
         """Check if a service exists on the OSCAR cluster."""
         log.debug("%s: Checking if service '%s' exists on OSCAR cluster", LOG_PREFIX_SERVICE_MANAGER, name)
         try:
-            services_response = client.list_services()
-            log.debug("%s: List services response status: %d", LOG_PREFIX_SERVICE_MANAGER, services_response.status_code)
-            
-            if services_response.status_code == 200:
-                existing_services = json.loads(services_response.text)
-                log.debug("%s: Found %d existing services on cluster", LOG_PREFIX_SERVICE_MANAGER, len(existing_services))
-                
-                for service in existing_services:
-                    service_name_in_list = service.get('name')
-                    log.debug("%s: Checking service: %s", LOG_PREFIX_SERVICE_MANAGER, service_name_in_list)
-                    if service_name_in_list == name:
-                        log.info("%s: Service already exists on cluster: %s", LOG_PREFIX_SERVICE_MANAGER, name)
-                        self._service_cache[name] = service
-                        return service
-                
-                log.debug("%s: Service '%s' not found among existing services", LOG_PREFIX_SERVICE_MANAGER, name)
-            else:
-                log.warning("%s: Failed to list services, status code: %d", LOG_PREFIX_SERVICE_MANAGER, services_response.status_code)
-                
+            # Ask for the single service instead of listing and scanning all of them
+            response = client.get_service(name)
+            service = json_loads(response.content)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                log.debug("%s: Service '%s' not found on cluster", LOG_PREFIX_SERVICE_MANAGER, name)
+                return None
+            log.debug("%s: Service lookup failed (%s), falling back to the service list", LOG_PREFIX_SERVICE_MANAGER, e)
+            service = self._get_cluster_services_index(client).get(name)
         except Exception as e:
-            log.warning("%s: Could not check existing services: %s", LOG_PREFIX_SERVICE_MANAGER, e)
+            log.debug("%s: Service lookup failed (%s), falling back to the service list", LOG_PREFIX_SERVICE_MANAGER, e)
+            service = self._get_cluster_services_index(client).get(name)
+        
+        if service:
+            log.info("%s: Service already exists on cluster: %s", LOG_PREFIX_SERVICE_MANAGER, name)
+            self._cache_service(name, service)
+            return service
         return None
     
+    def _get_cluster_services_index(self, client, ttl=SERVICE_INDEX_TTL):
+        """Return the cluster's services by name, listing them at most once per ttl seconds."""
+        # Concurrent service creations share a single listing
+        with self._lock:
+            now = time.monotonic()
+            if self._cluster_services is not None and now - self._cluster_services_ts < ttl:
+                return self._cluster_services
+        
+            try:
+                services_response = client.list_services()
+                log.debug("%s: List services response status: %d", LOG_PREFIX_SERVICE_MANAGER, services_response.status_code)
+                if services_response.status_code != 200:
+                    log.warning("%s: Failed to list services, status code: %d", LOG_PREFIX_SERVICE_MANAGER, services_response.status_code)
+                    return self._cluster_services or {}
+                self._cluster_services = {s.get('name'): s for s in json_loads(services_response.content)}
+                self._cluster_services_ts = now
+                log.debug("%s: Found %d existing services on cluster", LOG_PREFIX_SERVICE_MANAGER, len(self._cluster_services))
+            except Exception as e:
+                log.warning("%s: Could not check existing services: %s", LOG_PREFIX_SERVICE_MANAGER, e)
+                return self._cluster_services or {}
+            return self._cluster_services
+    
+    def _wait_for_service(self, client, service_name, timeout=DEFAULT_SERVICE_SETUP_WAIT):
+        """
+        Wait for a just-created service to show up on the cluster.
+        
+        Checks right away and then with growing pauses, returning as soon as the
+        service is found, or None once timeout seconds have passed.
+        """
+        log.debug("%s: Waiting up to %d seconds for service setup to complete", LOG_PREFIX_SERVICE_MANAGER, timeout)
+        deadline = time.monotonic() + timeout
+        delay = SERVICE_READY_POLL_INITIAL_DELAY
+        while True:
+            service = self._check_service_exists(client, service_name)
+            remaining = deadline - time.monotonic()
+            if service or remaining <= 0:
+                return service
+            time.sleep(min(delay, remaining))
+            delay = min(delay * DEFAULT_POLL_BACKOFF_FACTOR, SERVICE_READY_POLL_MAX_DELAY)
+    
     def _create_service_with_retry(self, client, service_name, service_def):
         """Create service with retry logic."""
         max_retries = DEFAULT_MAX_RETRIES
         retry_delay = DEFAULT_RETRY_DELAY
         last_exception = None
+        # Serialized once for the debug log instead of on every attempt
+        debug = log.isEnabledFor(logging.DEBUG)
+        service_def_repr = json.dumps(service_def) if debug else None
         
         for attempt in range(1, max_retries + 1):
             log.info("%s: Attempt %d/%d to create service %s", LOG_PREFIX_SERVICE_MANAGER, attempt, max_retries, service_name)
@@ -310,27 +569,28 @@ class OSCARServiceManager:
             try:
                 # Create service using OSCAR API
                 log.debug("%s: Sending service creation request to OSCAR API", LOG_PREFIX_SERVICE_MANAGER)
-                log.debug("%s: Complete service definition to create: %s", LOG_PREFIX_SERVICE_MANAGER, json.dumps(service_def, indent=2))
+                if service_def_repr is not None:
+                    log.debug("%s: Complete service definition to create: %s", LOG_PREFIX_SERVICE_MANAGER, service_def_repr)
                 
                 response = client.create_service(service_def)
                 log.debug("%s: Service creation response status: %d", LOG_PREFIX_SERVICE_MANAGER, response.status_code)
-                log.debug("%s: Service creation response text: %s", LOG_PREFIX_SERVICE_MANAGER, response.text)
-                
-                # Wait for service setup to complete
-                log.debug("%s: Waiting %d seconds for service setup to complete", LOG_PREFIX_SERVICE_MANAGER, DEFAULT_SERVICE_SETUP_WAIT)
-                time.sleep(DEFAULT_SERVICE_SETUP_WAIT)
+                if debug:
+                    log.debug("%s: Service creation response text: %s", LOG_PREFIX_SERVICE_MANAGER, response.text)
                 
                 # Always check if service was created, regardless of API response
                 log.debug("%s: Verifying service creation by checking if service exists", LOG_PREFIX_SERVICE_MANAGER)
-                created_service = self._check_service_exists(client, service_name)
+                created_service = self._wait_for_service(client, service_name)
                 if created_service:
                     log.info("%s: Service successfully created and verified: %s", LOG_PREFIX_SERVICE_MANAGER, service_name)
-                    self._service_cache[service_name] = service_def
+                    self._cache_service(service_name, service_def)
                     return service_name
                 
                 if response.status_code in [200, 201]:
                     log.info("%s: Service creation API succeeded (status %d): %s", LOG_PREFIX_SERVICE_MANAGER, response.status_code, service_name)
-                    self._service_cache[service_name] = service_def
+                    self._cache_service(service_name, service_def)
+                    with self._lock:
+                        if self._cluster_services is not None:
+                            self._cluster_services[service_name] = service_def
                     return service_name
                 else:
                     # Include response text in error message for better debugging
@@ -353,25 +613,58 @@ class OSCARServiceManager:
                 created_service = self._check_service_exists(client, service_name)
                 if created_service:
                     log.info("%s: Service exists despite exception: %s", LOG_PREFIX_SERVICE_MANAGER, service_name)
-                    self._service_cache[service_name] = service_def
+                    self._cache_service(service_name, service_def)
                     return service_name
                 
                 # If this isn't the last attempt, wait before retrying
                 if attempt < max_retries:
                     log.debug("%s: Waiting %d seconds before retry", LOG_PREFIX_SERVICE_MANAGER, retry_delay)
                     time.sleep(retry_delay)
-                    retry_delay *= DEFAULT_RETRY_MULTIPLIER  # Exponential backoff
+                    retry_delay = min(retry_delay * DEFAULT_RETRY_MULTIPLIER, DEFAULT_RETRY_MAX_DELAY)  # Exponential backoff
         
         # If we get here, all retries failed - raise an exception
         log.error("%s: Failed to create service %s after %d retry attempts", LOG_PREFIX_SERVICE_MANAGER, service_name, max_retries)
         raise RuntimeError(f"Failed to create OSCAR service '{service_name}' after {max_retries} attempts. Last error: {last_exception}")
         
+    def prewarm(self, tool_steps):
+        """
+        Create the services of several tools concurrently before any job needs them.
+        
+        Args:
+            tool_steps: (tool_spec, job_name) pairs, as later passed to get_or_create_service
+            
+        Returns:
+            Names of the services that are ready
+        """
+        # Steps resolving to the same service (e.g. scatter jobs) are only created once
+        pending = {}
+        for tool_spec, job_name in tool_steps:
+            _, service_name = self._resolve_service(tool_spec, job_name)
+            pending.setdefault(service_name, (tool_spec, job_name))
+        if not pending:
+            return []
+        
+        log.info("%s: Preparing %d service(s) before the run starts", LOG_PREFIX_SERVICE_MANAGER, len(pending))
+        futures = {self.get_or_create_service_async(tool_spec, job_name): service_name
+                   for service_name, (tool_spec, job_name) in pending.items()}
+        ready = []
+        for future, service_name in futures.items():
+            try:
+                ready.append(future.result())
+            except Exception as e:
+                # The job will try again when it runs
+                log.warning("%s: Could not prepare service %s: %s", LOG_PREFIX_SERVICE_MANAGER, service_name, e)
+        return ready
+    
+    def get_or_create_service_async(self, tool_spec, job_name=None):
+        """Run get_or_create_service on the shared service pool and return its Future."""
+        return _service_pool().submit(self.get_or_create_service, tool_spec, job_name)
+        
     def get_or_create_service(self, tool_spec, job_name=None):
         """Get existing service or create new one for the CommandLineTool."""
         log.debug("%s: Starting get_or_create_service for tool: %s", LOG_PREFIX_SERVICE_MANAGER, tool_spec.get('id', 'unknown'))
         
-        requirements = self.extract_service_requirements(tool_spec)
-        service_name = self.generate_service_name(tool_spec, requirements, job_name)
+        requirements, service_name = self._resolve_service(tool_spec, job_name)
         
         log.info("%s: Generated service name '%s' for tool '%s'", LOG_PREFIX_SERVICE_MANAGER, service_name, tool_spec.get('id', 'unknown'))
         
@@ -394,4 +687,68 @@ class OSCARServiceManager:
         log.info("%s: Creating new service for tool: %s -> %s", LOG_PREFIX_SERVICE_MANAGER, tool_spec.get('id', 'unknown'), service_name)
         service_def = self.create_service_definition(service_name, requirements, self.mount_path, self.shared_minio_config)
         
-        return self._create_service_with_retry(client, service_name, service_def)
+        service_name = self._create_service_with_retry(client, service_name, service_def)
+        if SERVICE_WARMUP_ENABLED:
+            threading.Thread(target=self._warm_service, args=(service_name, service_def), daemon=True).start()
+        return service_name
+    
+    def _warm_service(self, service_name, service_def, invocations=SERVICE_WARMUP_INVOCATIONS):
+        """
+        Invoke a new service with an empty script so its image is pulled before it is needed.
+        
+        The script only exits; once it finished, its input and outputs are deleted.
+        Failures are logged and ignored.
+        """
+        input_provider = service_def['input'][0]['storage_provider']
+        input_path = service_def['input'][0]['path']
+        script_names = []
+        try:
+            input_client = get_provider_client(self.get_client(), input_provider, service_def)
+            with tempfile.TemporaryDirectory(prefix="cwl_oscar_warmup_") as temp_dir:
+                for _ in range(invocations):
+                    # Unique names, so runs warming the same service don't clean up after each other
+                    script_name = f"cwl_oscar_warmup_{uuid.uuid4().hex}.sh"
+                    warmup_script = os.path.join(temp_dir, script_name)
+                    with open(warmup_script, 'w') as f:
+                        f.write("# cwl-oscar image warm-up\nexit 0\n")
+                    input_client.upload_file(warmup_script, input_path)
+                    script_names.append(script_name)
+            log.debug("%s: Sent %d warm-up invocation(s) to %s", LOG_PREFIX_SERVICE_MANAGER, invocations, service_name)
+            self._remove_warmup_files(service_def, script_names)
+        except Exception as e:
+            log.debug("%s: Warm-up of %s failed: %s", LOG_PREFIX_SERVICE_MANAGER, service_name, e)
+    
+    def _remove_warmup_files(self, service_def, script_names, timeout=SERVICE_WARMUP_TIMEOUT):
+        """
+        Wait up to timeout seconds for warm-up invocations to finish, then delete
+        their scripts from the input path and their exit codes and logs from the
+        output path. Only S3-compatible storage providers are cleaned up.
+        """
+        client = self.get_client()
+        input_provider = service_def['input'][0]['storage_provider']
+        output_provider = service_def['output'][0]['storage_provider']
+        input_s3 = getattr(get_provider_client(client, input_provider, service_def), 'client', None)
+        output_s3 = getattr(get_provider_client(client, output_provider, service_def), 'client', None)
+        if not hasattr(input_s3, 'delete_object') or not hasattr(output_s3, 'head_object'):
+            log.debug("%s: Storage provider cannot delete objects, keeping warm-up files", LOG_PREFIX_SERVICE_MANAGER)
+            return
+        in_bucket, in_prefix = service_def['input'][0]['path'].split('/', 1)
+        out_bucket, out_prefix = service_def['output'][0]['path'].split('/', 1)
+        
+        deadline = time.monotonic() + timeout
+        delay = DEFAULT_POLL_INITIAL_DELAY
+        for script_name in script_names:
+            exit_code_key = f"{out_prefix}/{script_name}{EXIT_CODE_EXTENSION}"
+            while time.monotonic() < deadline:
+                try:
+                    output_s3.head_object(Bucket=out_bucket, Key=exit_code_key)
+                    break
+                except Exception:
+                    time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+                    delay = min(delay * DEFAULT_POLL_BACKOFF_FACTOR, DEFAULT_POLL_MAX_DELAY)
+        
+        for script_name in script_names:
+            input_s3.delete_object(Bucket=in_bucket, Key=f"{in_prefix}/{script_name}")
+            for suffix in (EXIT_CODE_EXTENSION,) + SERVICE_LOG_EXTENSIONS:
+                output_s3.delete_object(Bucket=out_bucket, Key=f"{out_prefix}/{script_name}{suffix}")
+        log.debug("%s: Removed the files of %d warm-up invocation(s)", LOG_PREFIX_SERVICE_MANAGER, len(script_names))
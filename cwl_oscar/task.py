@@ -15,23 +15,30 @@
 
 """OSCAR Task for job execution."""
 
+import hashlib
+import json
 import logging
 import os
-import re
+import tempfile
+import threading
 import time
+from functools import cached_property
+from itertools import chain
 from typing import Dict, Any, Optional
 
 from cwltool.job import JobBase
+from cwltool.utils import visit_class
+from schema_salad.ref_resolver import uri_file_path
 
 try:
     from constants import *
-    from service_manager import OSCARServiceManager
     from executor import OSCARExecutor
+    from utils import base_step_name, unique_job_id, JobLogAdapter
 except ImportError:
     # Fallback for package import
     from .constants import *
-    from .service_manager import OSCARServiceManager
     from .executor import OSCARExecutor
+    from .utils import base_step_name, unique_job_id, JobLogAdapter
 
 log = logging.getLogger("oscar-backend")
 
@@ -39,6 +46,13 @@ log = logging.getLogger("oscar-backend")
 class OSCARTask(JobBase):
     """OSCAR-specific task implementation."""
     
+    # Tasks currently submitting to OSCAR, mapped to their executor, for drain_oscar_tasks()
+    _active = {}
+    _active_lock = threading.Lock()
+    # Task cache keys being computed right now, mapped to an event set when the run ends
+    _in_flight = {}
+    _in_flight_lock = threading.Lock()
+    
     def __init__(self, builder, joborder, make_path_mapper, requirements, hints, name,
                  cluster_manager, mount_path, service_name, runtime_context,
                  tool_spec=None, shared_minio_config=None):
@@ -49,6 +63,8 @@ class OSCARTask(JobBase):
         self.runtime_context = runtime_context
         self.tool_spec = tool_spec # Store tool specification
         self.shared_minio_config = shared_minio_config
+        # Logs prefixed with the job name (LOG_PREFIX_JOB)
+        self.job_log = JobLogAdapter(log, name)
         
         # We'll create executors dynamically for each cluster as needed
     
@@ -67,51 +83,66 @@ class OSCARTask(JobBase):
         for attempt in range(max_retries + 1):  # +1 to include initial attempt
             if os.path.exists(output_dir):
                 if attempt > 0:
-                    log.info(LOG_PREFIX_JOB + " Output directory found after %d retries: %s", self.name, attempt, output_dir)
+                    self.job_log.info("Output directory found after %d retries: %s", attempt, output_dir)
                 return True
             
             if attempt < max_retries:  # Don't sleep after the last attempt
-                log.debug(LOG_PREFIX_JOB + " Output directory not found (attempt %d/%d), waiting %d seconds: %s", 
-                         self.name, attempt + 1, max_retries + 1, retry_delay, output_dir)
+                self.job_log.debug("Output directory not found (attempt %d/%d), waiting %d seconds: %s",
+                                   attempt + 1, max_retries + 1, retry_delay, output_dir)
                 time.sleep(retry_delay)
         
         return False
         
     def run(self, runtimeContext, tmpdir_lock=None):
         """Execute the job using OSCAR with run-specific workspace."""
+        cluster_config = None
+        cache_key = None
+        self._claimed_cache_key = False
         try:
-            log.info(LOG_PREFIX_JOB + " Starting OSCAR execution", self.name)
+            self.job_log.info("Starting OSCAR execution")
             
-            # Generate job ID for this run using base step name (strip scatter suffixes)
-            base_step_name = re.sub(r'_\d+$', '', self.name)
-            job_id = f"{base_step_name}_{int(time.time())}"
-            log.debug(LOG_PREFIX_JOB + " Generated job_id: %s (from step: %s)", self.name, job_id, self.name)
+            # Clusters are mapped by step, without the scatter suffix of the job name; the job ID
+            # names this job's output directory, so it keeps the full name and a random part
+            step_name = base_step_name(self.name)
+            job_id = unique_job_id(self.name)
+            self.job_log.debug("Generated job_id: %s (step: %s)", job_id, step_name)
             
             # Build the command line
             cmd = self.build_command_line()
             
             # Set up environment 
-            env = self.build_environment()
+            env = self.job_environment
             
             # Set working directory - the command script will create its own run-specific directory
             workdir = self.mount_path
             
-            # Get cluster for this specific step (uses step mapping if available, otherwise round-robin)
-            cluster_config = self.cluster_manager.get_cluster_for_step(base_step_name)
+            # Reuse the outputs of an identical earlier run instead of submitting to OSCAR
+            task_cache = getattr(self.runtime_context, 'oscar_task_cache', None)
+            cache_key = self._task_cache_key(cmd, env) if task_cache else None
+            if cache_key:
+                cached_outputs = self._load_or_claim_cache_key(task_cache, cache_key)
+                if cached_outputs is not None:
+                    self.job_log.info("Reusing cached outputs (key %s)", cache_key)
+                    self.outputs = cached_outputs
+                    process_status = "success"
+                    return
+            
+            # Get cluster for this specific step (uses step mapping if available, otherwise the scheduling policy)
+            cluster_config = self.cluster_manager.acquire_cluster_for_step(step_name)
             if not cluster_config:
                 raise RuntimeError("No available clusters for task execution")
             
-            log.info(LOG_PREFIX_JOB + " Executing on cluster: %s", self.name, cluster_config.name)
+            self.job_log.info("Executing on cluster: %s", cluster_config.name)
             
-            # Create service manager and executor for this specific cluster
-            service_manager = OSCARServiceManager(
-                cluster_config.endpoint,
-                cluster_config.token,
-                cluster_config.username,
-                cluster_config.password,
+            # Use the cluster's shared OSCAR client and service manager; the executor
+            # keeps the state of this submission, so each task gets its own
+            client = self.cluster_manager.get_client(cluster_config)
+            service_manager = self.cluster_manager.get_service_manager(
+                cluster_config,
                 self.mount_path,
-                cluster_config.ssl,
-                self.shared_minio_config
+                self.shared_minio_config,
+                lazy_image_policy=getattr(self.runtime_context, 'oscar_lazy_images', LAZY_IMAGE_NONE),
+                lazy_image_index=getattr(self.runtime_context, 'oscar_lazy_image_index', DEFAULT_LAZY_IMAGE_INDEX)
             )
             
             executor = OSCARExecutor(
@@ -121,35 +152,46 @@ class OSCARTask(JobBase):
                 cluster_config.password,
                 self.mount_path,
                 service_manager,
-                cluster_config.ssl
+                cluster_config.ssl,
+                client=client,
+                batcher=getattr(self.runtime_context, 'oscar_job_batcher', None)
             )
             
             # Execute the command using OSCAR
             stdout_file = getattr(self, 'stdout', None)
             
-            exit_code = executor.execute_command(
-                command=cmd,
-                environment=env,
-                working_directory=workdir,
-                job_name=self.name,
-                tool_spec=self.tool_spec,  # Pass tool specification for dynamic service selection
-                stdout_file=stdout_file,
-                job_id=job_id  # Pass the job_id to ensure consistency
-            )
+            with OSCARTask._active_lock:
+                OSCARTask._active[self] = executor
+            try:
+                exit_code = executor.execute_command(
+                    command=cmd,
+                    environment=env,
+                    working_directory=workdir,
+                    job_name=self.name,
+                    tool_spec=self.tool_spec,  # Pass tool specification for dynamic service selection
+                    stdout_file=stdout_file,
+                    job_id=job_id  # Pass the job_id to ensure consistency
+                )
+            finally:
+                with OSCARTask._active_lock:
+                    OSCARTask._active.pop(self, None)
             
             # Determine process status
             if exit_code == 0:
-                log.info(LOG_PREFIX_JOB + " completed successfully", self.name)
+                self.job_log.info("completed successfully")
                 process_status = "success"
             else:
-                log.error(LOG_PREFIX_JOB + " failed with exit code %d", self.name, exit_code)
+                self.job_log.error("failed with exit code %d", exit_code)
                 process_status = "permanentFail"
+                # Outputs of a failed job are discarded, so don't scan the mount for them
+                self.outputs = {}
+                return
             
             # Collect outputs from the mount path where they were copied
             try:
                 # Outputs are now copied to mount_path/job_id by the script
                 output_dir = os.path.join(self.mount_path, job_id)
-                log.info(LOG_PREFIX_JOB + " Looking for outputs in: %s (job_id: %s)", self.name, output_dir, job_id)
+                self.job_log.info("Looking for outputs in: %s (job_id: %s)", output_dir, job_id)
                 
                 # * Check if output directory exists with retry logic for shared mount sync
                 output_dir_found = self._wait_for_output_directory(output_dir)
@@ -166,25 +208,38 @@ class OSCARTask(JobBase):
                     # Restore original outdir
                     self.builder.outdir = original_outdir
                     
-                    log.info(LOG_PREFIX_JOB + " Collected outputs: %s", self.name, outputs)
+                    self.job_log.info("Collected outputs: %s", outputs)
+                    
+                    if cache_key and process_status == "success":
+                        try:
+                            self._store_cached_outputs(task_cache, cache_key, outputs)
+                        except Exception as e:
+                            self.job_log.warning("Could not cache outputs: %s", e)
                 else:
-                    log.warning(LOG_PREFIX_JOB + " Output directory not found after retries: %s", self.name, output_dir)
+                    self.job_log.warning("Output directory not found after retries: %s", output_dir)
                     self.outputs = {}
                     process_status = "permanentFail"
                 
             except Exception as e:
-                log.error(LOG_PREFIX_JOB + " Error collecting outputs: %s", self.name, e)
+                self.job_log.error("Error collecting outputs: %s", e)
                 self.outputs = {}
                 process_status = "permanentFail"
                 
         except Exception as err:
-            log.error(LOG_PREFIX_JOB + " job error:\n%s", self.name, err)
+            self.job_log.error("job error:\n%s", err)
             if log.isEnabledFor(logging.DEBUG):
                 log.exception(err)
             process_status = "permanentFail"
             self.outputs = {}
         
         finally:
+            if cluster_config is not None:
+                self.cluster_manager.release_cluster(cluster_config)
+            if cache_key and self._claimed_cache_key:
+                # Wake identical tasks waiting for this run's outputs
+                with OSCARTask._in_flight_lock:
+                    OSCARTask._in_flight.pop(cache_key).set()
+            
             # Ensure outputs is set
             if self.outputs is None:
                 self.outputs = {}
@@ -193,20 +248,110 @@ class OSCARTask(JobBase):
             with self.runtime_context.workflow_eval_lock:
                 self.output_callback(self.outputs, process_status)
             
-            log.info(LOG_PREFIX_JOB + " OUTPUTS: %s", self.name, self.outputs)
+            self.job_log.info("OUTPUTS: %s", self.outputs)
             
             # Don't return a status - let cwltool handle cleanup
             return
             
+    def _task_cache_key(self, cmd, env):
+        """
+        Compute the reuse key of this task for --oscar-task-cache.
+        
+        The key covers the tool definition, command line, environment and the
+        identity of every input file (checksum if known, otherwise size and mtime).
+        """
+        input_files = []
+        
+        def fingerprint(file_obj):
+            path = file_obj.get('path') or file_obj.get('location', '')
+            identity = file_obj.get('checksum')
+            if identity is None:
+                try:
+                    stat = os.stat(path)
+                    identity = f"{stat.st_size}:{stat.st_mtime_ns}"
+                except OSError:
+                    identity = file_obj.get('location')
+            input_files.append((path, identity))
+        
+        visit_class(self.joborder, ("File",), fingerprint)
+        payload = json.dumps({
+            'tool': self.tool_spec,
+            'command': cmd,
+            # The job name only labels the run, identical work under another name is reused
+            'environment': {k: v for k, v in env.items() if k != 'CWL_JOB_NAME'},
+            'inputs': sorted(input_files),
+        }, sort_keys=True, default=str)
+        # A fixed stdlib digest, so a persistent cache keeps hitting across environments
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _load_cached_outputs(self, cache_dir, cache_key):
+        """Return the cached outputs for cache_key if they exist and still point at existing files."""
+        cache_file = os.path.join(cache_dir, f"{cache_key}.json")
+        try:
+            with open(cache_file, 'r') as f:
+                outputs = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        missing = []
+        
+        def check_exists(entry):
+            location = entry.get('location', '')
+            path = uri_file_path(location) if location.startswith('file://') else location
+            if not os.path.exists(path):
+                missing.append(path)
+        
+        visit_class(outputs, ("File", "Directory"), check_exists)
+        if missing:
+            self.job_log.debug("Cached outputs are gone (%s), running again", missing[0])
+            return None
+        return outputs
+    
+    def _load_or_claim_cache_key(self, cache_dir, cache_key):
+        """
+        Return the cached outputs for cache_key, or None once this task has claimed the key.
+        
+        A task that finds an identical one already running waits for it and reuses its
+        outputs; if that run leaves none, the key is claimed and the task runs itself.
+        """
+        while True:
+            outputs = self._load_cached_outputs(cache_dir, cache_key)
+            if outputs is not None:
+                return outputs
+            with OSCARTask._in_flight_lock:
+                running = OSCARTask._in_flight.get(cache_key)
+                if running is None:
+                    OSCARTask._in_flight[cache_key] = threading.Event()
+                    self._claimed_cache_key = True
+                    return None
+            self.job_log.info("Waiting for an identical task already running (key %s)", cache_key)
+            running.wait()
+    
+    def _store_cached_outputs(self, cache_dir, cache_key, outputs):
+        """Atomically record the outputs of a successful run under cache_key."""
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=f".{cache_key}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(outputs, f)
+            os.replace(tmp_path, os.path.join(cache_dir, f"{cache_key}.json"))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        
     def build_command_line(self):
         """Build the command line to execute."""
         # The command line is already built and available as self.command_line
         # from the parent JobBase class
-        log.debug(LOG_PREFIX_JOB + " Command line: %s", self.name, self.command_line)
+        self.job_log.debug("Command line: %s", self.command_line)
         return self.command_line
         
-    def build_environment(self):
-        """Build environment variables for the job - only CWL-specific variables from the CWL specification."""
+    @cached_property
+    def job_environment(self):
+        """Environment variables for the job - only CWL-specific variables from the CWL specification.
+        
+        Built once per task; none of its sources change after the job is created.
+        """
         env = {}
         
         # Add CWL-specific environment variables needed by cwl-oscar
@@ -225,25 +370,11 @@ class OSCARTask(JobBase):
         return env
     
     def _get_cwl_environment_variables(self):
-        """Extract environment variables defined in CWL EnvVarRequirement."""
+        """Extract environment variables defined in CWL EnvVarRequirement (requirements, then hints)."""
         env_vars = {}
-        
-        # Check if the tool has requirements with EnvVarRequirement
-        if hasattr(self, 'requirements') and self.requirements:
-            for req in self.requirements:
-                if req.get('class') == 'EnvVarRequirement':
-                    env_def = req.get('envDef', {})
-                    for var_name, var_value in env_def.items():
-                        env_vars[var_name] = var_value
-        
-        # Also check hints for environment variables
-        if hasattr(self, 'hints') and self.hints:
-            for hint in self.hints:
-                if hint.get('class') == 'EnvVarRequirement':
-                    env_def = hint.get('envDef', {})
-                    for var_name, var_value in env_def.items():
-                        env_vars[var_name] = var_value
-        
+        for req in chain(getattr(self, 'requirements', None) or (), getattr(self, 'hints', None) or ()):
+            if req.get('class') == 'EnvVarRequirement':
+                env_vars.update(req.get('envDef', {}))
         return env_vars
         
     def _required_env(self):
@@ -253,3 +384,36 @@ class OSCARTask(JobBase):
     def _preserve_environment(self, env):
         """Preserve environment variables (abstract method from JobBase)."""
         return env
+
+
+def drain_oscar_tasks(timeout=5):
+    """
+    Cancel the remote OSCAR jobs of every task still waiting on OSCAR.
+    
+    Cancellation runs in parallel on daemon threads and is abandoned after
+    timeout seconds so an interrupted run always exits promptly.
+    
+    Returns:
+        Number of OSCAR jobs removed before the timeout
+    """
+    with OSCARTask._active_lock:
+        active = list(OSCARTask._active.items())
+    if not active:
+        return 0
+    
+    log.info("Cancelling remote OSCAR jobs of %d task(s)...", len(active))
+    removed = []
+    
+    def cancel(task, executor):
+        try:
+            removed.append(executor.cancel_submitted_jobs())
+        except Exception as e:
+            task.job_log.warning("Could not cancel remote job: %s", e)
+    
+    threads = [threading.Thread(target=cancel, args=item, daemon=True) for item in active]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.time()))
+    return sum(removed)
@@ -233,6 +233,194 @@ def test_output_directory_retry():
         print(f"✗ Output directory retry test failed: {e}")
         return False
 
+def test_batch_same_step_jobs():
+    """Test that batched jobs of one scattered step keep separate outputs and exit codes."""
+    print("\nTesting batched jobs of the same step...")
+    
+    try:
+        import shutil
+        from executor import JobBatcher, OSCARExecutor
+        from utils import unique_job_id
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            mount_path = os.path.join(temp_dir, "mount")
+            oscar_tmp = os.path.join(temp_dir, "oscar_tmp")
+            os.makedirs(mount_path)
+            os.makedirs(oscar_tmp)
+            
+            # Run the uploaded batch script locally, the way the OSCAR service script would
+            class LocalBatchExecutor(OSCARExecutor):
+                def upload_and_wait_for_output(self, local_file_path, timeout_seconds=None, content=None, output_suffix=None, **kwargs):
+                    with open(local_file_path, 'wb') as f:
+                        f.write(content)
+                    env = dict(os.environ, TMP_OUTPUT_DIR=oscar_tmp, CWL_MOUNT_PATH=mount_path)
+                    subprocess.run(["bash", local_file_path], env=env, capture_output=True)
+                    self.codes_path = os.path.join(oscar_tmp, os.path.basename(local_file_path) + output_suffix)
+                    return {'Key': os.path.basename(self.codes_path)}
+                
+                def download_output_file(self, remote_output_path, local_download_path):
+                    shutil.copy(self.codes_path, local_download_path)
+                    return True
+            
+            executor = LocalBatchExecutor("http://localhost", "token", None, None, mount_path)
+            executor.service_name = "test-service"
+            
+            # Two scatter elements of step "count", started in the same second
+            jobs = []
+            for job_name, exit_code in (("count", 0), ("count_2", 3)):
+                job_id = unique_job_id(job_name)
+                _, script = executor.build_command_script(
+                    ["sh", "-c", f"echo {job_name} > result.txt; exit {exit_code}"], {}, job_id=job_id
+                )
+                jobs.append((job_id, script))
+            
+            exit_codes = executor.batch_execute(jobs)
+            if exit_codes == [0, 3]:
+                print("✓ Each batched job reported its own exit code")
+            else:
+                print(f"✗ Expected exit codes [0, 3], got {exit_codes}")
+                return False
+            
+            for (job_id, _), job_name in zip(jobs, ("count", "count_2")):
+                with open(os.path.join(mount_path, job_id, "result.txt")) as f:
+                    content = f.read().strip()
+                if content != job_name:
+                    print(f"✗ Outputs of {job_name} were overwritten: {content}")
+                    return False
+            print("✓ Each batched job kept its own outputs")
+            
+            # Jobs of one run share a batcher; a cancelled job leaves its batch before it is submitted
+            batcher = JobBatcher(max_jobs=3, window=5)
+            first, batch = batcher.add("key", "job-1", "script-1")
+            second, joined = batcher.add("key", "job-2", "script-2")
+            if batch is None or joined is not None:
+                print("✗ Only the first job should open the batch")
+                return False
+            if not batcher.withdraw(second) or second.result() != 1:
+                print("✗ Queued job was not withdrawn from its batch")
+                return False
+            batcher.add("key", "job-3", "script-3")
+            batcher.add("key", "job-4", "script-4")
+            queued = [job_id for job_id, _, _ in batcher.collect("key", batch)]
+            if queued != ["job-1", "job-3", "job-4"]:
+                print(f"✗ Expected a full batch of job-1, job-3 and job-4, got {queued}")
+                return False
+            if batcher.withdraw(first):
+                print("✗ Job of a submitted batch should not be withdrawn")
+                return False
+            print("✓ Batcher grouped the queued jobs and dropped the withdrawn one")
+            
+            print("✓ All batch tests passed!")
+            return True
+            
+    except Exception as e:
+        print(f"✗ Batch test failed: {e}")
+        return False
+
+def test_stale_service_cache():
+    """Test that a cached service deleted from the cluster is forgotten and created again."""
+    print("\nTesting recovery from a stale service cache...")
+    
+    try:
+        import json
+        import logging
+        import requests
+        import executor as ex
+        import service_manager as sm
+        from executor import OSCARExecutor
+        from utils import JobLogAdapter
+        
+        class Response:
+            def __init__(self, status_code, body=None):
+                self.status_code = status_code
+                self.content = json.dumps(body or {}).encode()
+                self.text = self.content.decode()
+        
+        # Cluster that has lost every service it had; only new ones show up
+        class Cluster:
+            def __init__(self):
+                self.services = {}
+                self.created = []
+            
+            def get_service(self, name):
+                if name not in self.services:
+                    raise requests.HTTPError(response=Response(404))
+                return Response(200, self.services[name])
+            
+            def create_service(self, service_def):
+                self.created.append(service_def['name'])
+                self.services[service_def['name']] = service_def
+                return Response(201)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            old_cache_file = sm.SERVICE_CACHE_FILE
+            sm.SERVICE_CACHE_FILE = os.path.join(temp_dir, "services.json")
+            sm._KNOWN_SERVICES = None
+            try:
+                cluster = Cluster()
+                manager = sm.OSCARServiceManager("http://localhost", "token", None, None, "/mnt/test/mount",
+                                                 client=cluster)
+                tool_spec = {'class': 'CommandLineTool', 'baseCommand': 'echo'}
+                _, service_name = manager._resolve_service(tool_spec, "hello")
+                # An earlier run verified the service, which has since been deleted
+                sm._record_known_service("http://localhost", service_name)
+                manager._service_cache[service_name] = {}
+                
+                executor = OSCARExecutor("http://localhost", "token", None, None, "/mnt/test/mount",
+                                         service_manager=manager, client=cluster)
+                executor.service_name = service_name
+                executor._ensure_service_exists(tool_spec, "hello", JobLogAdapter(logging.getLogger("oscar-backend"), "hello"))
+                
+                if cluster.created != [service_name]:
+                    print(f"✗ Expected {service_name} to be created again, created {cluster.created}")
+                    return False
+                print("✓ Missing service was created again")
+                if executor.get_service_config().get('name') != service_name:
+                    print("✗ Executor did not pick up the new service")
+                    return False
+                
+                # A rejected upload drops the shared configuration, so the next job fetches it again
+                class RejectedUploadExecutor(OSCARExecutor):
+                    def _upload(self, client, provider, remote_path, local_file_path, content=None):
+                        return False
+                
+                stale = {'name': service_name, 'input': [{'storage_provider': 'minio', 'path': 'old/in'}],
+                         'output': [{'storage_provider': 'minio', 'path': 'old/out'}]}
+                ex._SERVICE_CONFIGS[(id(cluster), service_name)] = (cluster, stale)
+                rejected = RejectedUploadExecutor("http://localhost", "token", None, None, "/mnt/test/mount",
+                                                  service_manager=manager, client=cluster)
+                rejected.service_name = service_name
+                rejected.upload_and_wait_for_output(os.path.join(temp_dir, "job.sh"), content=b"")
+                refetched = OSCARExecutor("http://localhost", "token", None, None, "/mnt/test/mount",
+                                          service_manager=manager, client=cluster)
+                refetched.service_name = service_name
+                if refetched.get_service_config() is stale:
+                    print("✗ Configuration of a rejected upload is still cached")
+                    return False
+                print("✓ Rejected upload dropped the cached service configuration")
+                with open(sm.SERVICE_CACHE_FILE) as f:
+                    if service_name not in json.load(f).get("http://localhost", {}):
+                        print("✗ Recreated service was not cached again")
+                        return False
+                
+                # A service that cannot be recreated is forgotten for later runs
+                manager.forget_service(service_name)
+                with open(sm.SERVICE_CACHE_FILE) as f:
+                    if service_name in json.load(f).get("http://localhost", {}):
+                        print("✗ Forgotten service is still in the cache file")
+                        return False
+                print("✓ Forgotten service was dropped from the cache file")
+            finally:
+                sm.SERVICE_CACHE_FILE = old_cache_file
+                sm._KNOWN_SERVICES = None
+        
+        print("✓ All stale service cache tests passed!")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Stale service cache test failed: {e}")
+        return False
+
 def test_service_name_uniqueness():
     """Test that different MinIO configurations produce unique service names."""
     print("\nTesting service name uniqueness with different MinIO configs...")
@@ -368,6 +556,188 @@ def test_service_name_uniqueness():
         print(f"✗ Service name uniqueness test failed: {e}")
         return False
 
+def test_cluster_scheduling():
+    """Test weighted round-robin and least-loaded cluster selection and in-flight accounting."""
+    print("\nTesting cluster scheduling...")
+    
+    try:
+        from cluster_manager import ClusterConfig, ClusterManager
+        from constants import SCHEDULING_LEAST_LOADED
+        
+        # Weighted round-robin interleaves the clusters instead of sending runs of jobs to one
+        manager = ClusterManager()
+        for name, weight in (("a", 3), ("b", 2), ("c", 1)):
+            manager.add_cluster(ClusterConfig(endpoint=f"https://{name}", token="token", name=name, weight=weight))
+        selected = [manager.get_next_cluster().name for _ in range(12)]
+        if selected != ["a", "b", "c", "a", "b", "a"] * 2:
+            print(f"✗ Unexpected weighted round-robin order: {selected}")
+            return False
+        print("✓ Weighted round-robin follows the cluster weights")
+        
+        # Least-loaded picks the cluster with the fewest in-flight tasks per unit of weight
+        manager = ClusterManager(SCHEDULING_LEAST_LOADED)
+        heavy = ClusterConfig(endpoint="https://heavy", token="token", name="heavy", weight=3)
+        light = ClusterConfig(endpoint="https://light", token="token", name="light")
+        mapped = ClusterConfig(endpoint="https://mapped", token="token", name="mapped", steps=["align"])
+        for cluster in (heavy, light, mapped):
+            manager.add_cluster(cluster)
+        mapped.in_flight = 10  # Only its mapped step may run there anyway
+        
+        selected = [manager.acquire_cluster_for_step("count").name for _ in range(4)]
+        if selected != ["heavy", "light", "heavy", "heavy"]:
+            print(f"✗ Unexpected least-loaded order: {selected}")
+            return False
+        if (heavy.in_flight, light.in_flight) != (3, 1):
+            print(f"✗ Expected 3 and 1 tasks in flight, got {heavy.in_flight} and {light.in_flight}")
+            return False
+        print("✓ Least-loaded selection balances tasks by weight")
+        
+        manager.release_cluster(light)
+        if manager.acquire_cluster_for_step("count") is not light:
+            print("✗ Released cluster should be the least loaded again")
+            return False
+        if manager.acquire_cluster_for_step("align") is not mapped or mapped.in_flight != 11:
+            print("✗ Mapped step should run on its cluster whatever its load")
+            return False
+        for _ in range(3):
+            manager.release_cluster(light)
+        if light.in_flight != 0:
+            print(f"✗ In-flight count went below zero: {light.in_flight}")
+            return False
+        print("✓ Acquired and released clusters keep their in-flight counts")
+        
+        print("✓ All cluster scheduling tests passed!")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Cluster scheduling test failed: {e}")
+        return False
+
+def test_task_cache_claim():
+    """Test that identical tasks wait for the one running and reuse or take over its cache key."""
+    print("\nTesting task cache claims...")
+    
+    try:
+        import logging
+        import threading
+        from task import OSCARTask
+        from utils import JobLogAdapter
+        
+        def new_task(name):
+            task = OSCARTask.__new__(OSCARTask)
+            task.job_log = JobLogAdapter(logging.getLogger("oscar-backend"), name)
+            task._claimed_cache_key = False
+            return task
+        
+        def release(task, cache_key):
+            # What OSCARTask.run does once the claiming task finished
+            with OSCARTask._in_flight_lock:
+                OSCARTask._in_flight.pop(cache_key).set()
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_dir = os.path.join(temp_dir, "cache")
+            output_file = os.path.join(temp_dir, "result.txt")
+            with open(output_file, 'w') as f:
+                f.write("result")
+            outputs = {"result": {"class": "File", "location": f"file://{output_file}"}}
+            
+            for first_succeeds in (True, False):
+                cache_key = f"key-{first_succeeds}"
+                first, second = new_task("first"), new_task("second")
+                if first._load_or_claim_cache_key(cache_dir, cache_key) is not None or not first._claimed_cache_key:
+                    print("✗ First task should claim a key nobody holds")
+                    return False
+                
+                found = []
+                waiter = threading.Thread(
+                    target=lambda: found.append(second._load_or_claim_cache_key(cache_dir, cache_key))
+                )
+                waiter.start()
+                waiter.join(0.2)
+                if not waiter.is_alive():
+                    print("✗ Identical task should wait for the running one")
+                    return False
+                
+                if first_succeeds:
+                    first._store_cached_outputs(cache_dir, cache_key, outputs)
+                release(first, cache_key)
+                waiter.join(5)
+                
+                if first_succeeds:
+                    if found != [outputs] or second._claimed_cache_key:
+                        print(f"✗ Waiting task should reuse the stored outputs, got {found}")
+                        return False
+                    print("✓ Waiting task reused the outputs of the identical run")
+                else:
+                    if found != [None] or not second._claimed_cache_key:
+                        print("✗ Waiting task should claim the key of a run that left no outputs")
+                        return False
+                    release(second, cache_key)
+                    print("✓ Waiting task took over the key of a failed run")
+            
+            os.remove(output_file)
+            if new_task("third")._load_or_claim_cache_key(cache_dir, "key-True") is not None:
+                print("✗ Cached outputs pointing at deleted files should not be reused")
+                return False
+            release(None, "key-True")
+            print("✓ Cached outputs with missing files were ignored")
+        
+        print("✓ All task cache tests passed!")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Task cache test failed: {e}")
+        return False
+
+def test_env_value_quoting():
+    """Test that environment values reach the command script unchanged, without being expanded."""
+    print("\nTesting environment value quoting...")
+    
+    try:
+        from executor import OSCARExecutor, _retry_after
+        
+        executor = OSCARExecutor("http://localhost", "token", None, None, "/mnt/test/mount")
+        values = {
+            "BACKTICKS": "a`touch pwned`b",
+            "BACKSLASHES": "C:\\path\\to\\file\\",
+            "DOLLARS": "$HOME $(id) ${PATH}",
+            "QUOTES": "say \"hi\" and 'bye'",
+        }
+        _, script = executor.build_command_script(["true"], values, job_id="quoting")
+        exports = "".join(line + "\n" for line in script.splitlines() if line.startswith("export "))
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            check = exports + "".join(f'printf "%s\\0" "${name}"\n' for name in values)
+            result = subprocess.run(["bash", "-c", check], cwd=temp_dir, capture_output=True, text=True)
+            if os.listdir(temp_dir):
+                print("✗ A command substitution in a value was executed")
+                return False
+        received = result.stdout.split("\0")[:-1]
+        if received != list(values.values()):
+            print(f"✗ Values changed on their way through the script: {received}")
+            return False
+        print("✓ Backticks, backslashes, dollars and quotes are passed through literally")
+        
+        # Retry-After of a throttled storage request, in seconds or as an unsupported HTTP date
+        def storage_error(headers):
+            error = Exception("SlowDown")
+            error.response = {'ResponseMetadata': {'HTTPHeaders': headers}}
+            return error
+        
+        if (_retry_after(storage_error({'retry-after': '3'})) != 3
+                or _retry_after(storage_error({'retry-after': 'Wed, 21 Oct 2026 07:28:00 GMT'})) != 0
+                or _retry_after(storage_error({})) != 0 or _retry_after(Exception("other")) != 0):
+            print("✗ Retry-After header was not read as expected")
+            return False
+        print("✓ Retry-After header is honoured when given in seconds")
+        
+        print("✓ All quoting tests passed!")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Quoting test failed: {e}")
+        return False
+
 def test_oscar_service_direct():
     """Test OSCAR service execution directly."""
     print("\nTesting OSCAR service execution directly...")
@@ -427,18 +797,33 @@ def main():
     # Test 2: Service name uniqueness (unit test - doesn't require OSCAR connection)
     test_service_name_uniqueness()
     
-    # Test 3: OSCAR client connectivity
+    # Test 3: Batched jobs of one step (unit test - doesn't require OSCAR connection)
+    test_batch_same_step_jobs()
+    
+    # Test 4: Stale service cache recovery (unit test - doesn't require OSCAR connection)
+    test_stale_service_cache()
+    
+    # Test 5: Cluster scheduling (unit test - doesn't require OSCAR connection)
+    test_cluster_scheduling()
+    
+    # Test 6: Task cache claims (unit test - doesn't require OSCAR connection)
+    test_task_cache_claim()
+    
+    # Test 7: Environment value quoting (unit test - doesn't require OSCAR connection)
+    test_env_value_quoting()
+    
+    # Test 8: OSCAR client connectivity
     if not test_oscar_client():
         print("Skipping further tests due to OSCAR client failure")
         return 1
     
-    # Test 4: Basic cwl-oscar functionality
+    # Test 9: Basic cwl-oscar functionality
     test_cwl_oscar_basic()
     
-    # Test 5: Direct OSCAR service test
+    # Test 10: Direct OSCAR service test
     test_oscar_service_direct()
     
-    # Test 6: Full CWL workflow execution
+    # Test 11: Full CWL workflow execution
     # test_cwl_oscar_execution()  # Commented out for now as it requires the service to be properly set up
     
     print("\n" + "=" * 50)
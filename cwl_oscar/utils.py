@@ -15,20 +15,71 @@
 
 """Utility functions for cwl-oscar."""
 
+import functools
+import json
 import logging
+import os
+import re
+import threading
+import time
+import uuid
 from typing import Dict, Optional
 
+import boto3
+from botocore.config import Config
 from oscar_python.client import Client
 
+try:
+    # Optional ("speedups" extra): orjson parses large OSCAR responses several times faster
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
 try:
     from .constants import *
+    from .context_utils import suppress_stdout_to_stderr
 except ImportError:
     # Fallback for standalone execution
     from constants import *
+    from context_utils import suppress_stdout_to_stderr
 
 log = logging.getLogger("oscar-backend")
 
 
+class JobLogAdapter(logging.LoggerAdapter):
+    """Logger adapter prefixing messages with LOG_PREFIX_JOB for one job.
+    
+    The prefix is formatted once per job, and only added to records that are
+    actually emitted.
+    """
+    
+    def __init__(self, logger, job_name):
+        super().__init__(logger, {'job': job_name})
+        self.prefix = LOG_PREFIX_JOB % job_name + " "
+        
+    def process(self, msg, kwargs):
+        return self.prefix + msg, kwargs
+
+
+# Provider clients per OSCAR client, shared by all executors. Building one is costly: the
+# credentials come from the cluster over HTTP and every S3/MinIO client is a new boto3 client
+# (with its own connection pool and TLS sessions)
+_STORAGE_CLIENTS = {}
+_STORAGE_CLIENTS_LOCK = threading.Lock()
+# One boto3 session builds every S3/MinIO client; sessions are not thread-safe, so it is
+# only used under _STORAGE_CLIENTS_LOCK
+_STORAGE_SESSION = boto3.session.Session()
+_STORAGE_CLIENT_CONFIG = Config(
+    max_pool_connections=STORAGE_MAX_POOL_CONNECTIONS,
+    retries={'max_attempts': STORAGE_MAX_ATTEMPTS, 'mode': 'adaptive'},
+)
+
+# Characters not allowed in a Kubernetes (RFC 1123) name, after lowercasing
+_INVALID_NAME_CHARS = re.compile(r'[^a-z0-9-]')
+# Suffix cwltool appends to make scattered/repeated job names unique (_2, _3, ...)
+_JOB_NAME_SUFFIX = re.compile(r'_\d+$')
+
+
 def create_oscar_client_options(
     endpoint: str,
     token: Optional[str] = None,
@@ -113,6 +164,7 @@ def create_oscar_client(
     return client
 
 
+@functools.lru_cache(maxsize=1024)
 def sanitize_service_name(name: str) -> str:
     """
     Sanitize service name to follow Kubernetes naming rules (RFC 1123 subdomain).
@@ -123,12 +175,10 @@ def sanitize_service_name(name: str) -> str:
     Returns:
         Sanitized service name safe for Kubernetes
     """
-    import re
-    
     # Replace underscores with hyphens and ensure only lowercase alphanumeric + hyphens
     clean_name = name.lower().replace('_', '-')
     # Remove any other invalid characters, keep only a-z, 0-9, and hyphens
-    clean_name = re.sub(r'[^a-z0-9-]', '', clean_name)
+    clean_name = _INVALID_NAME_CHARS.sub('', clean_name)
     # Ensure it doesn't start or end with a hyphen
     clean_name = clean_name.strip('-')
     # Ensure it's not empty
@@ -136,3 +186,154 @@ def sanitize_service_name(name: str) -> str:
         clean_name = 'tool'
     
     return clean_name
+
+
+def base_step_name(job_name: str) -> str:
+    """
+    Strip the uniqueness suffix (_2, _3, etc.) cwltool adds to job names.
+    
+    Args:
+        job_name: cwltool job name
+        
+    Returns:
+        Name of the step the job belongs to
+    """
+    return _JOB_NAME_SUFFIX.sub('', job_name)
+
+
+def unique_job_id(job_name: str) -> str:
+    """
+    Return an ID for one run of a cwltool job, unique even among jobs started in the same second.
+    
+    Scattered jobs of a step (step, step_2, ...) keep their own names, so they
+    never share an output directory on the mount or an entry of a batch.
+    
+    Args:
+        job_name: cwltool job name
+        
+    Returns:
+        Job ID: the job name, a timestamp and a random suffix
+    """
+    return f"{job_name}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+
+class S3ProviderClient:
+    """
+    Transfers for a MinIO or S3 storage provider on one pooled boto3 client.
+    
+    Offers the methods of oscar-python's provider clients, with the same remote
+    path conventions, and exposes the boto3 client as ``client``.
+    """
+    
+    def __init__(self, s3_client):
+        self.client = s3_client
+        
+    def list_files_from_path(self, path):
+        """List the objects of a bucket below the first folder of path ('bucket/folder/...')."""
+        bucket, _, rest = path.partition('/')
+        return self.client.list_objects(Bucket=bucket, Prefix=rest.split('/', 1)[0])
+        
+    def upload_file(self, local_path, remote_path):
+        """Upload a file into the remote_path folder ('bucket/folder'), keeping its name."""
+        bucket, folder = remote_path.split('/', 1)
+        self.client.upload_file(local_path, bucket, f"{folder}/{os.path.basename(local_path)}")
+        return True
+        
+    def download_file(self, local_path, remote_path):
+        """Download the object at remote_path ('bucket/key') into the local_path directory."""
+        bucket, key = remote_path.split('/', 1)
+        self.client.download_file(bucket, key, os.path.join(local_path, os.path.basename(remote_path)))
+        return True
+
+
+class _StorageProviderClient:
+    """
+    One provider of an oscar-python Storage, for providers without a boto3 client (WebDAV, Onedata).
+    
+    oscar-python reports transfers with print(), so each call keeps stdout
+    (cwltool's JSON output) clean by sending it to stderr for its duration.
+    """
+    
+    def __init__(self, storage, provider):
+        self._storage = storage
+        self._provider = provider
+        
+    def list_files_from_path(self, path):
+        with suppress_stdout_to_stderr():
+            return self._storage.list_files_from_path(self._provider, path)
+        
+    def upload_file(self, local_path, remote_path):
+        with suppress_stdout_to_stderr():
+            return self._storage.upload_file(self._provider, local_path, remote_path)
+        
+    def download_file(self, local_path, remote_path):
+        with suppress_stdout_to_stderr():
+            return self._storage.download_file(self._provider, local_path, remote_path)
+
+
+def get_provider_client(client: Client, provider: str, service: Optional[Dict] = None):
+    """
+    Return the storage client of an OSCAR client's storage provider, created once and reused.
+    
+    The default MinIO provider's credentials come from the cluster configuration;
+    other providers are looked up in the storage_providers of the service using them.
+    
+    Args:
+        client: OSCAR client the storage belongs to
+        provider: Storage provider name (e.g. 'minio.default')
+        service: Configuration of the service using the provider, needed for
+            providers other than DEFAULT_STORAGE_PROVIDER
+        
+    Returns:
+        Provider client (upload_file, download_file, list_files_from_path); S3ProviderClient
+        for MinIO and S3 providers
+    """
+    entry = _STORAGE_CLIENTS.get(id(client))
+    if entry is None or entry[0] is not client or provider not in entry[1]:
+        # boto3 clients are thread-safe once built, but building them is not
+        with _STORAGE_CLIENTS_LOCK:
+            entry = _STORAGE_CLIENTS.get(id(client))
+            if entry is None or entry[0] is not client:
+                entry = (client, {})
+                _STORAGE_CLIENTS[id(client)] = entry
+            if provider not in entry[1]:
+                kind, _, name = provider.partition('.')
+                if kind in ('minio', 's3'):
+                    credentials = _provider_credentials(client, provider, service)
+                    # Concurrent jobs would overflow boto3's default pool of 10 connections
+                    entry[1][provider] = S3ProviderClient(_pooled_s3_client(kind, credentials))
+                else:
+                    storage = client.create_storage_client(service['name'] if service else None)
+                    entry[1][provider] = _StorageProviderClient(storage, provider)
+    return entry[1][provider]
+
+
+def _provider_credentials(client: Client, provider: str, service: Optional[Dict]) -> dict:
+    """Return the credentials of a storage provider from the cluster or service configuration."""
+    if provider == DEFAULT_STORAGE_PROVIDER:
+        return json_loads(client.get_cluster_config().content)['minio_provider']
+    kind, _, name = provider.partition('.')
+    credentials = ((service or {}).get('storage_providers') or {}).get(kind, {}).get(name)
+    if not credentials:
+        raise ValueError(f"Storage provider {provider} is not defined")
+    return credentials
+
+
+def _pooled_s3_client(kind: str, credentials: dict):
+    """Build the boto3 client of a MinIO or S3 provider as oscar-python does, with a larger pool and retries."""
+    options = {
+        'region_name': credentials.get('region') or None,
+        'aws_access_key_id': credentials.get('access_key'),
+        'aws_secret_access_key': credentials.get('secret_key'),
+        'config': _STORAGE_CLIENT_CONFIG,
+    }
+    if kind == 'minio':
+        options['endpoint_url'] = credentials.get('endpoint') or DEFAULT_MINIO_ENDPOINT
+        options['verify'] = credentials.get('verify', True)
+    return _STORAGE_SESSION.client('s3', **options)
+
+
+def forget_storage_clients(client: Client) -> None:
+    """Drop the cached storage clients of an OSCAR client, e.g. after its credentials were rejected."""
+    with _STORAGE_CLIENTS_LOCK:
+        _STORAGE_CLIENTS.pop(id(client), None)